@@ -0,0 +1,436 @@
+# @title Offline Benchmark
+# @markdown Use: python benchmark.py [--scenarios bruteforce,passive,axfr] - runs subfin.py and dns_zone_transfer.py against local stand-ins, no network needed
+# @Galang Aprilian - 2025
+import dns.message
+import dns.name
+import dns.rdatatype
+import dns.rrset
+import argparse
+import contextlib
+import heapq
+import http.server
+import io
+import json
+import multiprocessing
+import os
+import random
+import select
+import shutil
+import socket
+import struct
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from urllib.parse import urlparse, parse_qs
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; peak RSS is reported as unknown there
+    resource = None
+
+import subfin
+import dns_zone_transfer
+
+BENCH_ZONE = 'bench.test'
+
+def address_for(name):
+    # Stable 10.x.x.x address per name
+    return struct.pack('!I', 0x0A000000 | (zlib.crc32(name.encode()) & 0xFFFFFF))
+
+def zone_names(zone, zone_size, passive_size):
+    # w<i> is what the brute-force wordlist hits; half of the p<i> names the
+    # passive stand-ins return exist, the rest are stale
+    names = {f"w{i}.{zone}" for i in range(zone_size)}
+    names.update(f"p{i}.{zone}" for i in range(passive_size // 2))
+    return names
+
+def serve_dns(conn, zone, zone_size, passive_size, latency, loss, wildcard, seed):
+    # Authoritative UDP stand-in. Answers A queries for names in zone_names()
+    # (or anything under the zone when wildcard is set) and NXDOMAIN with an
+    # SOA otherwise; latency delays every response, loss drops queries.
+    names = zone_names(zone, zone_size, passive_size)
+    rng = random.Random(seed)
+    soa = dns.rrset.from_text(f"{zone}.", 300, 'IN', 'SOA', f"ns.{zone}. hostmaster.{zone}. 1 3600 600 86400 60")
+    buffer = io.BytesIO()
+    soa.to_wire(buffer)
+    soa_wire = buffer.getvalue()
+    wildcard_address = address_for(f"*.{zone}")
+
+    def respond(query):
+        if len(query) < 17:
+            return None
+        offset = 12
+        labels = []
+        while query[offset]:
+            length = query[offset]
+            if length & 0xC0:
+                return None
+            labels.append(query[offset + 1:offset + 1 + length])
+            offset += length + 1
+        end = offset + 5
+        question = query[12:end]
+        qtype = struct.unpack('!H', query[end - 4:end - 2])[0]
+        name = b'.'.join(labels).decode('ascii', 'ignore').lower()
+        exists = name in names
+        address = address_for(name)
+        if not exists and wildcard and name.endswith('.' + zone):
+            # Every wildcard answer carries the same address, like a real *.zone record
+            exists = True
+            address = wildcard_address
+        if exists and qtype == dns.rdatatype.A:
+            answer = b'\xc0\x0c' + struct.pack('!HHIH', 1, 1, 300, 4) + address
+            return query[:2] + struct.pack('!HHHHH', 0x8580, 1, 1, 0, 0) + question + answer
+        rcode = 0 if exists or name == zone else 3
+        return query[:2] + struct.pack('!HHHHH', 0x8580 | rcode, 1, 0, 1, 0) + question + soa_wire
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+    sock.bind(('127.0.0.1', 0))
+    conn.send(sock.getsockname()[1])
+    pending = []
+    sequence = 0
+    while True:
+        now = time.monotonic()
+        while pending and pending[0][0] <= now:
+            _, _, response, address = heapq.heappop(pending)
+            sock.sendto(response, address)
+        readable, _, _ = select.select([sock], [], [], pending[0][0] - now if pending else None)
+        if not readable:
+            continue
+        query, address = sock.recvfrom(4096)
+        if loss and rng.random() < loss:
+            continue
+        response = respond(query)
+        if response is None:
+            continue
+        if latency:
+            sequence += 1
+            heapq.heappush(pending, (time.monotonic() + latency, sequence, response, address))
+        else:
+            sock.sendto(response, address)
+
+def serve_axfr(conn, zone, records):
+    # TCP stand-in that answers AXFR for a zone with `records` A records,
+    # 500 records per message. The messages are rendered once and only the
+    # query ID is patched in per transfer.
+    origin = dns.name.from_text(zone)
+    soa = dns.rrset.from_text(origin, 3600, 'IN', 'SOA', f"ns.{zone}. hostmaster.{zone}. 1 3600 600 86400 60")
+    rrsets = [soa, dns.rrset.from_text(origin, 3600, 'IN', 'NS', f"ns.{zone}.")]
+    for i in range(records):
+        name = f"h{i}.{zone}"
+        rrsets.append(dns.rrset.from_text(f"{name}.", 3600, 'IN', 'A', socket.inet_ntoa(address_for(name))))
+    rrsets.append(soa)
+    template = dns.message.make_query(origin, dns.rdatatype.AXFR)
+    template.id = 0
+    messages = []
+    for start in range(0, len(rrsets), 500):
+        response = dns.message.make_response(template)
+        response.answer = rrsets[start:start + 500]
+        wire = response.to_wire()
+        messages.append(wire)
+
+    def read_exact(client, size):
+        data = b''
+        while len(data) < size:
+            chunk = client.recv(size - len(data))
+            if not chunk:
+                return None
+            data += chunk
+        return data
+
+    def handle(client):
+        with client:
+            header = read_exact(client, 2)
+            if header is None:
+                return
+            query = read_exact(client, struct.unpack('!H', header)[0])
+            if query is None:
+                return
+            for wire in messages:
+                wire = query[:2] + wire[2:]
+                client.sendall(struct.pack('!H', len(wire)) + wire)
+
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    server.bind(('127.0.0.1', 0))
+    server.listen(64)
+    conn.send(server.getsockname()[1])
+    while True:
+        client, _ = server.accept()
+        threading.Thread(target=handle, args=(client,), daemon=True).start()
+
+class PassiveStubHandler(http.server.BaseHTTPRequestHandler):
+    # Replays crt.sh, VirusTotal, AlienVault OTX and HackerTarget payloads
+    # for server.zone with server.size names each
+    protocol_version = 'HTTP/1.1'
+
+    def send_body(self, body, content_type='application/json'):
+        body = body.encode()
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        zone = self.server.zone
+        names = [f"p{i}.{zone}" for i in range(self.server.size)]
+        if url.path == '/':
+            if query.get('output') == ['json']:
+                self.send_body(json.dumps([{'name_value': f"{name}\n*.{name}"} for name in names]))
+            else:
+                self.send_body(''.join(f"<TD>{name}</TD>" for name in names), 'text/html')
+        elif url.path.startswith('/ui/domains/'):
+            cursor = int(query.get('cursor', ['0'])[0])
+            page = names[cursor * 40:(cursor + 1) * 40]
+            meta = {'cursor': str(cursor + 1)} if (cursor + 1) * 40 < len(names) else {}
+            self.send_body(json.dumps({'data': [{'id': name} for name in page], 'meta': meta}))
+        elif url.path.startswith('/api/v1/indicators/domain/'):
+            limit = int(query.get('limit', ['500'])[0])
+            page = int(query.get('page', ['1'])[0])
+            entries = [{'hostname': name} for name in names[(page - 1) * limit:page * limit]]
+            self.send_body(json.dumps({'passive_dns': entries, 'count': len(names)}))
+        elif url.path.startswith('/hostsearch/'):
+            self.send_body('\n'.join(f"{name},10.0.0.1" for name in names), 'text/plain')
+        else:
+            self.send_error(404)
+
+    def log_message(self, *args):
+        pass
+
+def serve_http(conn, zone, size):
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), PassiveStubHandler)
+    server.zone = zone
+    server.size = size
+    conn.send(server.server_address[1])
+    server.serve_forever()
+
+def start_stand_in(context, target, *args):
+    # Runs a stand-in in its own process and returns (process, port)
+    parent, child = context.Pipe()
+    process = context.Process(target=target, args=(child,) + args, daemon=True)
+    process.start()
+    return process, parent.recv()
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+def percentile(values, q):
+    if not values:
+        return None
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def merged_histogram(metrics, name):
+    merged = subfin.Histogram()
+    for (key, _), histogram in metrics.histograms.items():
+        if key == name:
+            merged.counts = [a + b for a, b in zip(merged.counts, histogram.counts)]
+            merged.count += histogram.count
+            merged.sum += histogram.sum
+    return merged
+
+def counter_total(metrics, name):
+    return sum(value for (key, _), value in metrics.counters.items() if key == name)
+
+def milliseconds(seconds):
+    return None if seconds is None else round(seconds * 1000, 2)
+
+def make_finder(options, metrics, **kwargs):
+    pool = subfin.ResolverPool([f"127.0.0.1:{options['dns_port']}"], timeout=options['timeout'])
+    return subfin.SubdomainFinder(
+        BENCH_ZONE,
+        output='results.txt',
+        threads=options['threads'],
+        engine=options['engine'],
+        concurrency=options['concurrency'],
+        sockets=options['sockets'],
+        processes=options['processes'],
+        cache=None,
+        resolvers=pool,
+        metrics=metrics,
+        **kwargs
+    )
+
+def bench_bruteforce(options):
+    with open('words.txt', 'w') as f:
+        for i in range(options['words']):
+            f.write(f"w{i}\n")
+    metrics = subfin.Metrics()
+    finder = make_finder(options, metrics, wordlist='words.txt')
+    start = time.monotonic()
+    pipeline = finder.create_pipeline()
+    finder.add_sources(pipeline, passive=False, entries=finder.iter_wordlist_entries())
+    pipeline.run()
+    wall = time.monotonic() - start
+    latency = merged_histogram(metrics, 'dns_query_seconds')
+    results = counter_total(metrics, 'dns_results_total')
+    return {
+        'wall_s': round(wall, 3),
+        'qps': round(results / wall, 1) if wall else None,
+        'p50_ms': milliseconds(latency.percentile(0.5)),
+        'p99_ms': milliseconds(latency.percentile(0.99)),
+        'details': {
+            'candidates': results,
+            'queries': counter_total(metrics, 'dns_queries_total'),
+            'found': len(finder.subdomains)
+        }
+    }
+
+def bench_passive(options):
+    metrics = subfin.Metrics()
+    base_url = f"http://127.0.0.1:{options['http_port']}"
+    finder = make_finder(
+        options, metrics,
+        http=subfin.HTTPClient(timeout=options['timeout'] * 5),
+        source_urls={source: base_url for source in subfin.SubdomainFinder.SOURCE_URLS}
+    )
+    start = time.monotonic()
+    pipeline = finder.create_pipeline()
+    finder.add_sources(pipeline, passive=True)
+    pipeline.run()
+    wall = time.monotonic() - start
+    fetch = merged_histogram(metrics, 'source_fetch_seconds')
+    records = counter_total(metrics, 'source_records_total')
+    return {
+        'wall_s': round(wall, 3),
+        'qps': round(counter_total(metrics, 'dns_results_total') / wall, 1) if wall else None,
+        'p50_ms': milliseconds(fetch.percentile(0.5)),
+        'p99_ms': milliseconds(fetch.percentile(0.99)),
+        'details': {'records': records, 'found': len(finder.subdomains), 'unresolved': finder.unresolved_passive}
+    }
+
+def bench_axfr(options):
+    times = []
+    succeeded = 0
+    for _ in range(options['repeat']):
+        start = time.monotonic()
+        reason, _ = dns_zone_transfer.try_zone_transfer(BENCH_ZONE, '127.0.0.1', None, options['axfr_port'])
+        if reason in dns_zone_transfer.ALLOWED_REASONS:
+            succeeded += 1
+        times.append(time.monotonic() - start)
+    wall = sum(times)
+    return {
+        'wall_s': round(wall, 3),
+        # Records per second for zone transfers
+        'qps': round(options['records'] * succeeded / wall, 1) if wall else None,
+        'p50_ms': milliseconds(percentile(times, 0.5)),
+        'p99_ms': milliseconds(percentile(times, 0.99)),
+        'details': {'transfers': succeeded, 'records': options['records']}
+    }
+
+SCENARIOS = {
+    'bruteforce': bench_bruteforce,
+    'passive': bench_passive,
+    'axfr': bench_axfr
+}
+
+def run_scenario(conn, name, options):
+    # Runs in a fresh process so peak RSS is measured per scenario; output of
+    # the tools is discarded so terminal I/O is not part of the measurement
+    workdir = tempfile.mkdtemp(prefix='subfin_bench_')
+    os.chdir(workdir)
+    try:
+        with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+            result = SCENARIOS[name](options)
+        result['peak_rss_mb'] = peak_rss_mb()
+    except Exception as e:
+        result = {'error': f"{type(e).__name__}: {e}"}
+    finally:
+        os.chdir(os.path.dirname(workdir))
+        shutil.rmtree(workdir, ignore_errors=True)
+    result['scenario'] = name
+    conn.send(result)
+
+def format_value(value):
+    return '-' if value is None else str(value)
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline benchmark for subfin.py and dns_zone_transfer.py')
+    parser.add_argument('--scenarios', default='bruteforce,passive,axfr', help='Comma separated scenarios to run (default: all)')
+    parser.add_argument('--words', type=int, default=100000, help='Wordlist size for the brute-force scenario')
+    parser.add_argument('--zone-size', type=int, default=1000, help='Names that exist in the stub zone')
+    parser.add_argument('--latency', type=float, default=0.0, help='Added DNS stub latency in milliseconds')
+    parser.add_argument('--loss', type=float, default=0.0, help='Fraction of DNS queries the stub drops (0-1)')
+    parser.add_argument('--wildcard', action='store_true', help='Answer every name under the stub zone')
+    parser.add_argument('--passive-size', type=int, default=5000, help='Names returned by each passive source stand-in')
+    parser.add_argument('--records', type=int, default=10000, help='A records in the AXFR stand-in zone')
+    parser.add_argument('--repeat', type=int, default=5, help='Zone transfers to run')
+    parser.add_argument('-e', '--engine', choices=['threads', 'async', 'bulk'], default='bulk', help='subfin.py resolution engine')
+    parser.add_argument('-t', '--threads', type=int, default=10, help='Threads for the threads engine')
+    parser.add_argument('-c', '--concurrency', type=int, default=1000, help='In-flight queries for the async and bulk engines')
+    parser.add_argument('--sockets', type=int, default=4, help='UDP sockets for the bulk engine')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='Resolver worker processes')
+    parser.add_argument('--timeout', type=float, default=1.0, help='DNS timeout in seconds')
+    parser.add_argument('--seed', type=int, default=1, help='Seed for simulated packet loss')
+    parser.add_argument('--json', help='Also write the results to this JSON file')
+    args = parser.parse_args()
+
+    scenarios = [name.strip() for name in args.scenarios.split(',') if name.strip()]
+    unknown = [name for name in scenarios if name not in SCENARIOS]
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(unknown)}")
+
+    context = multiprocessing.get_context('spawn')
+    stand_ins = []
+    options = {
+        'words': args.words,
+        'records': args.records,
+        'repeat': args.repeat,
+        'engine': args.engine,
+        'threads': args.threads,
+        'concurrency': args.concurrency,
+        'sockets': args.sockets,
+        'processes': args.processes,
+        'timeout': args.timeout
+    }
+    results = []
+    try:
+        if 'bruteforce' in scenarios or 'passive' in scenarios:
+            process, options['dns_port'] = start_stand_in(
+                context, serve_dns, BENCH_ZONE, args.zone_size, args.passive_size,
+                args.latency / 1000, args.loss, args.wildcard, args.seed
+            )
+            stand_ins.append(process)
+        if 'passive' in scenarios:
+            process, options['http_port'] = start_stand_in(context, serve_http, BENCH_ZONE, args.passive_size)
+            stand_ins.append(process)
+        if 'axfr' in scenarios:
+            process, options['axfr_port'] = start_stand_in(context, serve_axfr, BENCH_ZONE, args.records)
+            stand_ins.append(process)
+
+        print(f"{'scenario':<12} {'wall s':>9} {'qps':>11} {'p50 ms':>9} {'p99 ms':>9} {'rss MB':>8}  details")
+        for name in scenarios:
+            parent, child = context.Pipe()
+            worker = context.Process(target=run_scenario, args=(child, name, options))
+            worker.start()
+            result = parent.recv()
+            worker.join()
+            results.append(result)
+            if 'error' in result:
+                print(f"{name:<12} [-] {result['error']}")
+                continue
+            details = ' '.join(f"{key}={value}" for key, value in result['details'].items())
+            print(f"{name:<12} {format_value(result['wall_s']):>9} {format_value(result['qps']):>11} "
+                  f"{format_value(result['p50_ms']):>9} {format_value(result['p99_ms']):>9} "
+                  f"{format_value(result['peak_rss_mb']):>8}  {details}")
+    finally:
+        for process in stand_ins:
+            process.terminate()
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'options': vars(args), 'results': results}, f, indent=2)
+        print(f"\n[+] Results saved to {args.json}")
+
+if __name__ == "__main__":
+    main()
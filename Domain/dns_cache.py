@@ -0,0 +1,218 @@
+# @title DNS Resolution Cache
+# @markdown Shared by subfin.py and dns_zone_transfer.py: python dns_cache.py [cache.db] to show stats
+# @Galang Aprilian - 2025
+import dns.resolver
+import dns.rdatatype
+import argparse
+import sqlite3
+import threading
+import json
+import os
+import time
+from sqlite_store import open_database, transaction
+
+DEFAULT_CACHE_PATH = 'dns_cache.db'
+# Used when a negative answer carries no SOA record in the authority section
+DEFAULT_NEGATIVE_TTL = 300
+# After a failed write the cache waits this long before flushing again
+RETRY_SECONDS = 30
+
+class DNSCache:
+    # Positive and negative answers keyed by (FQDN, record type). Entries live
+    # for the record TTL (or the SOA negative TTL) and the table is trimmed to
+    # max_entries by evicting the entries closest to expiry first. Database
+    # errors never reach the caller: a failed read is a miss and a failed
+    # write keeps the batch in memory (up to max_pending rows) for a later
+    # flush, and the first error is reported.
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=1000000, flush_every=500, max_pending=100000):
+        self.path = path
+        self.max_entries = max_entries
+        self.flush_every = flush_every
+        self.max_pending = max_pending
+        self.lock = threading.Lock()
+        self.conn = open_database(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS answers ('
+            'name TEXT NOT NULL, rdtype TEXT NOT NULL, status TEXT NOT NULL, '
+            'data TEXT NOT NULL, expires REAL NOT NULL, PRIMARY KEY (name, rdtype)) WITHOUT ROWID'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS answers_expires ON answers (expires)')
+        # Writes are batched; pending rows are also served by get()
+        self.pending = {}
+        self.writes_since_evict = 0
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.retry_at = 0.0
+
+    def _error(self, e):
+        self.errors += 1
+        if self.errors == 1:
+            print(f"[!] DNS cache {self.path} failed ({e}); answers are still resolved but may not be cached")
+
+    @staticmethod
+    def _key(name, rdtype):
+        return str(name).lower().rstrip('.'), dns.rdatatype.to_text(dns.rdatatype.RdataType.make(rdtype))
+
+    def get(self, name, rdtype, with_ttl=False):
+        # Returns (status, values) for a live entry, otherwise None; with_ttl
+        # adds the remaining TTL in seconds
+        key = self._key(name, rdtype)
+        with self.lock:
+            row = self.pending.get(key)
+            if row is None:
+                try:
+                    row = self.conn.execute(
+                        'SELECT status, data, expires FROM answers WHERE name = ? AND rdtype = ?', key
+                    ).fetchone()
+                except sqlite3.Error as e:
+                    self._error(e)
+            else:
+                row = row[2:]
+            if row is None or row[2] <= time.time():
+                self.misses += 1
+                return None
+            self.hits += 1
+        if with_ttl:
+            return row[0], json.loads(row[1]), max(0, int(row[2] - time.time()))
+        return row[0], json.loads(row[1])
+
+    def put(self, name, rdtype, status, values, ttl):
+        if ttl is None or ttl <= 0:
+            return
+        key = self._key(name, rdtype)
+        with self.lock:
+            self.pending[key] = (*key, status, json.dumps(list(values)), time.time() + ttl)
+            if len(self.pending) >= self.flush_every and time.monotonic() >= self.retry_at:
+                self._flush()
+
+    def _flush(self):
+        if not self.pending:
+            return
+        rows = list(self.pending.values())
+        self.pending.clear()
+        try:
+            with transaction(self.conn):
+                self.conn.executemany('INSERT OR REPLACE INTO answers VALUES (?, ?, ?, ?, ?)', rows)
+            self.writes_since_evict += len(rows)
+            if self.writes_since_evict >= max(self.flush_every, self.max_entries // 100):
+                self._evict()
+        except sqlite3.Error as e:
+            # Keep the newest rows for a later flush and back off, so every
+            # put() does not retry a write that just failed
+            self._error(e)
+            self.retry_at = time.monotonic() + RETRY_SECONDS
+            self.pending.update((row[:2], row) for row in rows[-self.max_pending:])
+
+    def _evict(self):
+        self.writes_since_evict = 0
+        self.conn.execute('DELETE FROM answers WHERE expires <= ?', (time.time(),))
+        count = self.conn.execute('SELECT COUNT(*) FROM answers').fetchone()[0]
+        if count > self.max_entries:
+            self.conn.execute(
+                'DELETE FROM answers WHERE (name, rdtype) IN '
+                '(SELECT name, rdtype FROM answers ORDER BY expires LIMIT ?)',
+                (count - self.max_entries,)
+            )
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def close(self):
+        with self.lock:
+            self._flush()
+            try:
+                self._evict()
+            except sqlite3.Error as e:
+                self._error(e)
+            self.conn.close()
+
+    def stats(self):
+        with self.lock:
+            self._flush()
+            total, live = self.conn.execute(
+                'SELECT COUNT(*), SUM(expires > ?) FROM answers', (time.time(),)
+            ).fetchone()
+            by_status = dict(self.conn.execute(
+                'SELECT status, COUNT(*) FROM answers WHERE expires > ? GROUP BY status', (time.time(),)
+            ).fetchall())
+        return {'entries': total, 'live': live or 0, 'by_status': by_status}
+
+def negative_ttl(response):
+    # RFC 2308: negative answers are cached for min(SOA TTL, SOA MINIMUM)
+    if response is not None:
+        for rrset in response.authority:
+            if rrset.rdtype == dns.rdatatype.SOA:
+                return min(rrset.ttl, rrset[0].minimum)
+    return DEFAULT_NEGATIVE_TTL
+
+def store_answer(cache, name, rdtype, answer):
+    values = [rdata.to_text() for rdata in answer]
+    if cache is not None:
+        cache.put(name, rdtype, 'NOERROR', values, answer.rrset.ttl)
+    return 'NOERROR', values, answer.rrset.ttl
+
+def store_exception(cache, name, rdtype, error):
+    # Maps resolver exceptions to a negative status; anything that is not a
+    # definitive negative answer (timeouts, SERVFAIL) is re-raised uncached
+    if isinstance(error, dns.resolver.NXDOMAIN):
+        responses = list(error.responses().values())
+        status, ttl = 'NXDOMAIN', negative_ttl(responses[0] if responses else None)
+    elif isinstance(error, dns.resolver.NoAnswer):
+        status, ttl = 'NODATA', negative_ttl(error.response())
+    else:
+        raise error
+    if cache is not None:
+        cache.put(name, rdtype, status, [], ttl)
+    return status, [], ttl
+
+def cached_resolve(resolver, cache, name, rdtype, with_ttl=False):
+    # Returns (status, values) where status is NOERROR, NXDOMAIN or NODATA;
+    # with_ttl adds the (remaining) TTL of the answer
+    if cache is not None:
+        hit = cache.get(name, rdtype, with_ttl)
+        if hit is not None:
+            return hit
+    try:
+        answer = resolver.resolve(name, rdtype)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+        result = store_exception(cache, name, rdtype, e)
+    else:
+        result = store_answer(cache, name, rdtype, answer)
+    return result if with_ttl else result[:2]
+
+async def cached_resolve_async(resolver, cache, name, rdtype, with_ttl=False):
+    if cache is not None:
+        hit = cache.get(name, rdtype, with_ttl)
+        if hit is not None:
+            return hit
+    try:
+        answer = await resolver.resolve(name, rdtype)
+    except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer) as e:
+        result = store_exception(cache, name, rdtype, e)
+    else:
+        result = store_answer(cache, name, rdtype, answer)
+    return result if with_ttl else result[:2]
+
+def main():
+    parser = argparse.ArgumentParser(description='DNS resolution cache statistics')
+    parser.add_argument('path', nargs='?', default=DEFAULT_CACHE_PATH, help='Cache database file')
+    parser.add_argument('--purge', action='store_true', help='Delete expired entries')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"[-] Cache {args.path} does not exist")
+        return
+    cache = DNSCache(args.path)
+    if args.purge:
+        with cache.lock:
+            cache.conn.execute('DELETE FROM answers WHERE expires <= ?', (time.time(),))
+    stats = cache.stats()
+    print(f"[*] {args.path}: {stats['entries']} entries, {stats['live']} live")
+    for status, count in sorted(stats['by_status'].items()):
+        print(f"    {status}: {count}")
+    cache.close()
+
+if __name__ == "__main__":
+    main()
@@ -5,116 +5,654 @@
 import dns.resolver
 import dns.zone
 import dns.query
+import dns.inet
+import dns.message
+import dns.transaction
+import dns.xfr
 import sys
 import argparse
+import collections
+import concurrent.futures
+import itertools
+import json
 import os
 import time
 import socket
+import struct
+import threading
 from datetime import datetime
+from dns_cache import DNSCache, DEFAULT_CACHE_PATH, cached_resolve
+from zone_snapshot import ZoneSnapshots, DEFAULT_SNAPSHOT_PATH
+from zone_archive import ZoneArchive, DEFAULT_ARCHIVE_PATH
 
-def get_nameservers(domain):
-    """Mendapatkan nama server untuk domain"""
+# Alasan hasil try_zone_transfer: transferred, truncated (dipotong oleh --max-records/--max-bytes),
+# unchanged (IXFR, zona belum berubah), refused, timeout, connect_failed, no_address, empty, error.
+# Tiga yang pertama berarti server mengizinkan transfer
+ALLOWED_REASONS = ('transferred', 'truncated', 'unchanged')
+
+def get_nameservers(domain, cache=None):
+    """Mendapatkan nama server untuk domain (memakai cache DNS jika ada)"""
     try:
-        answers = dns.resolver.resolve(domain, 'NS')
-        return [str(answer.target).rstrip('.') for answer in answers]
+        status, targets = cached_resolve(dns.resolver.get_default_resolver(), cache, domain, 'NS')
+        if status != 'NOERROR':
+            raise dns.resolver.NoAnswer() if status == 'NODATA' else dns.resolver.NXDOMAIN()
+        return [target.rstrip('.') for target in targets]
     except Exception as e:
         print(f"Error mendapatkan nameservers untuk {domain}: {e}")
         return []
 
-def get_nameserver_ip(nameserver):
-    """Mendapatkan IP address dari nameserver"""
-    try:
-        return socket.gethostbyname(nameserver)
-    except socket.gaierror:
+def get_nameserver_ips(nameserver, cache=None):
+    """Mendapatkan semua IP address (A dan AAAA) dari nameserver (memakai cache DNS jika ada)"""
+    if dns.inet.is_address(nameserver):
+        return [nameserver]
+    addresses = []
+    resolver = dns.resolver.get_default_resolver()
+    for rdtype in ('A', 'AAAA'):
+        try:
+            status, values = cached_resolve(resolver, cache, nameserver, rdtype)
+        except Exception:
+            continue
+        addresses.extend(value for value in values if value not in addresses)
+    if not addresses:
+        # Fallback ke resolver sistem (mis. /etc/hosts)
+        try:
+            for info in socket.getaddrinfo(nameserver, None, proto=socket.IPPROTO_TCP):
+                if info[4][0] not in addresses:
+                    addresses.append(info[4][0])
+        except socket.gaierror:
+            pass
+    if not addresses:
         print(f"Error: Tidak dapat mendapatkan IP address untuk {nameserver}")
-        return None
+    return addresses
 
-def try_zone_transfer(domain, nameserver):
-    """Mencoba zone transfer dari nameserver menggunakan modul dnspython"""
-    print(f"\nMencoba Zone Transfer dari {nameserver} untuk {domain}")
-    
-    # Dapatkan IP dari nameserver
-    nameserver_ip = get_nameserver_ip(nameserver)
-    if not nameserver_ip:
-        print(f"[-] Zone Transfer gagal: Tidak dapat mendapatkan IP address untuk {nameserver}")
-        return False
-    
+def get_nameserver_ip(nameserver, cache=None):
+    """Mendapatkan satu IP address dari nameserver"""
+    addresses = get_nameserver_ips(nameserver, cache)
+    return addresses[0] if addresses else None
+
+class XfrConnectError(Exception):
+    """Koneksi TCP ke nameserver gagal sebelum transfer dimulai"""
+
+class _DiscardTransactionManager(dns.transaction.TransactionManager):
+    """dns.xfr.Inbound hanya dipakai untuk mengenali akhir transfer dan rcode; record dibaca
+    langsung dari pesan, jadi tidak ada yang disimpan"""
+    def __init__(self, origin):
+        self.info = (origin, False, origin)
+
+    def origin_information(self):
+        return self.info
+
+    def get_class(self):
+        return dns.rdataclass.IN
+
+    def reader(self):
+        raise NotImplementedError
+
+    def writer(self, replacement=False):
+        return _DiscardTransaction()
+
+class _DiscardTransaction:
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: None
+
+def xfr_messages(nameserver_ip, domain, port=53, connect_timeout=5, timeout=30, rdtype=dns.rdatatype.AXFR, serial=0):
+    """Seperti dns.query.xfr(relativize=False), tetapi connect dibatasi connect_timeout dan langsung
+    dilakukan di sini (XfrConnectError jika gagal); seluruh transfer dibatasi timeout. dns.query.xfr
+    tidak punya connect timeout tersendiri dan tidak menerima socket yang sudah terhubung"""
+    zone = dns.name.from_text(domain)
+    query = dns.message.make_query(zone, rdtype)
+    if rdtype == dns.rdatatype.IXFR:
+        rrset = query.find_rrset(query.authority, zone, dns.rdataclass.IN, dns.rdatatype.SOA, create=True)
+        rrset.add(dns.rdata.from_text('IN', 'SOA', f". . {serial} 0 0 0 0"), 0)
     try:
-        # Coba dengan explicit IPv4 address
-        print(f"  Menggunakan IP address nameserver: {nameserver_ip}")
-        zone = dns.zone.from_xfr(dns.query.xfr(nameserver_ip, domain, timeout=30, lifetime=30))
-        
-        # Jika kode mencapai sini, berarti zone transfer berhasil
-        print(f"[+] Zone Transfer berhasil untuk {domain} dari {nameserver}!")
-        
-        # Proses dan simpan hasil zone transfer
-        output_file = f"zone_transfer_{domain}_from_{nameserver}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
-        
-        records = []
-        for name, node in zone.nodes.items():
-            rdatasets = node.rdatasets
-            for rdataset in rdatasets:
-                for rdata in rdataset:
-                    record = {
-                        'name': name,
-                        'ttl': rdataset.ttl,
-                        'class': dns.rdataclass.to_text(rdataset.rdclass),
-                        'type': dns.rdatatype.to_text(rdataset.rdtype),
-                        'data': rdata.to_text()
-                    }
-                    records.append(record)
-        
-        # Tampilkan hasil di layar (maksimal 10 record)
-        print("\nRecord yang ditemukan:")
-        for i, record in enumerate(records):
-            if i < 10:
-                name_text = "@" if str(record['name']) == "." else str(record['name'])
-                print(f"  {name_text} {record['ttl']} {record['class']} {record['type']} {record['data']}")
-            else:
-                print(f"  ... dan {len(records) - 10} record lainnya")
-                break
-        
-        # Simpan hasil lengkap ke file
-        with open(output_file, 'w', encoding='utf-8') as f:
+        sock = socket.create_connection((nameserver_ip, port), timeout=connect_timeout)
+    except OSError as e:
+        raise XfrConnectError(e or type(e).__name__) from e
+    return _read_xfr(sock, query, zone, rdtype, serial, time.monotonic() + timeout)
+
+def _read_xfr(sock, query, zone, rdtype, serial, expiration):
+    """Mengirim query XFR lewat socket yang sudah terhubung dan menghasilkan pesan-pesan jawabannya"""
+    def read(count):
+        data = b''
+        while len(data) < count:
+            remaining = expiration - time.monotonic()
+            if remaining <= 0:
+                raise dns.exception.Timeout()
+            sock.settimeout(remaining)
+            try:
+                chunk = sock.recv(count - len(data))
+            except socket.timeout:
+                raise dns.exception.Timeout() from None
+            if not chunk:
+                raise EOFError('Koneksi ditutup oleh server')
+            data += chunk
+        return data
+
+    with sock:
+        wire = query.to_wire()
+        sock.settimeout(max(expiration - time.monotonic(), 0.001))
+        try:
+            sock.sendall(struct.pack('!H', len(wire)) + wire)
+        except socket.timeout:
+            raise dns.exception.Timeout() from None
+        with dns.xfr.Inbound(_DiscardTransactionManager(zone), rdtype, serial) as inbound:
+            done = False
+            while not done:
+                length, = struct.unpack('!H', read(2))
+                message = dns.message.from_wire(read(length), xfr=True, multi=True,
+                                                one_rr_per_rrset=rdtype == dns.rdatatype.IXFR)
+                done = inbound.process_message(message)
+                yield message
+
+def iter_xfr_records(messages, origin):
+    """Menghasilkan record (name, ttl, rdclass, rdtype, rdata) satu per satu dari pesan-pesan XFR"""
+    soa_seen = False
+    try:
+        for message in messages:
+            for rrset in message.answer:
+                if rrset.rdtype == dns.rdatatype.SOA and rrset.name == origin:
+                    # SOA kedua hanya penanda akhir AXFR
+                    if soa_seen:
+                        continue
+                    soa_seen = True
+                for rdata in rrset:
+                    yield rrset.name, rrset.ttl, rrset.rdclass, rrset.rdtype, rdata
+    finally:
+        # Menutup koneksi jika transfer dihentikan di tengah jalan
+        messages.close()
+
+def iter_ixfr_changes(messages, origin):
+    """Membaca respons IXFR record per record. Item pertama adalah serial terbaru dari server,
+    lalu ('-', record) / ('+', record) untuk setiap delta, atau ('=', record) jika server
+    menjawab dengan zona lengkap (gaya AXFR). Record berbentuk (name, ttl, rdclass, rdtype, rdata)"""
+    first = None
+    incremental = None
+    soa_count = 0
+    op = None
+    try:
+        for message in messages:
+            for rrset in message.answer:
+                for rdata in rrset:
+                    record = (rrset.name, rrset.ttl, rrset.rdclass, rrset.rdtype, rdata)
+                    is_soa = rrset.rdtype == dns.rdatatype.SOA and rrset.name == origin
+                    if first is None:
+                        first = record
+                        yield rdata.serial
+                        continue
+                    if incremental is None:
+                        # SOA kedua berarti delta; record lain berarti zona lengkap
+                        incremental = is_soa
+                        if not incremental:
+                            yield ('=',) + first
+                    if not incremental:
+                        if not is_soa:
+                            yield ('=',) + record
+                        continue
+                    if is_soa:
+                        # Setiap SOA membuka set hapus lalu set tambah secara bergantian;
+                        # SOA dengan serial terbaru di posisi set hapus adalah penutup
+                        soa_count += 1
+                        if soa_count % 2 and rdata.serial == first[4].serial:
+                            continue
+                        op = '-' if soa_count % 2 else '+'
+                    yield (op,) + record
+    finally:
+        messages.close()
+
+def snapshot_record(name, ttl, rdclass, rdtype, rdata):
+    """Bentuk record yang disimpan di snapshot: (name, class, type, data, ttl) dengan nama absolut"""
+    return name.to_text(), dns.rdataclass.to_text(rdclass), dns.rdatatype.to_text(rdtype), rdata.to_text(), ttl
+
+def save_zone_transfer(records, domain, nameserver, nameserver_ip, output_file, max_records=None, max_bytes=None,
+                       on_record=None, archive=None):
+    """Menulis record (dari iter_xfr_records) langsung ke file teks dan JSONL, tanpa menyimpan zona di memori,
+    dan ke arsip zona jika ada. Mengembalikan (jumlah record, 10 record pertama, terpotong oleh batas atau tidak)"""
+    origin = dns.name.from_text(domain)
+    jsonl_file = f"{os.path.splitext(output_file)[0]}.jsonl"
+    capture = archive.capture(domain, nameserver, nameserver_ip) if archive is not None else None
+    count = 0
+    written = 0
+    preview = []
+    truncated = False
+    try:
+        with open(output_file, 'w', encoding='utf-8') as f, open(jsonl_file, 'w', encoding='utf-8') as jsonl:
             f.write(f"Zone Transfer berhasil untuk {domain} dari {nameserver} ({nameserver_ip})\n")
             f.write(f"Waktu: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
             f.write("=" * 60 + "\n\n")
-            
-            for record in records:
-                name_text = "@" if str(record['name']) == "." else str(record['name'])
-                f.write(f"{name_text} {record['ttl']} {record['class']} {record['type']} {record['data']}\n")
-        
-        print(f"\n[+] Hasil lengkap disimpan ke {output_file}")
-        return True
-        
-    except dns.xfr.TransferError as e:
-        print(f"[-] Zone Transfer gagal: Transfer Error - {e}")
+
+            for name, ttl, rdclass, rdtype, rdata in records:
+                if (max_records and count >= max_records) or (max_bytes and written >= max_bytes):
+                    truncated = True
+                    break
+                rdclass = dns.rdataclass.to_text(rdclass)
+                rdtype = dns.rdatatype.to_text(rdtype)
+                line = f"{name.relativize(origin)} {ttl} {rdclass} {rdtype} {rdata.to_text(origin=origin, relativize=True)}"
+                f.write(line + "\n")
+                jsonl.write(json.dumps({
+                    'name': name.to_text(),
+                    'ttl': ttl,
+                    'class': rdclass,
+                    'type': rdtype,
+                    'data': rdata.to_text()
+                }) + "\n")
+                record = (name.to_text(), rdclass, rdtype, rdata.to_text(), ttl)
+                if on_record is not None:
+                    on_record(record)
+                if capture is not None:
+                    capture.add(record)
+                written += len(line) + 1
+                count += 1
+                if count <= 10:
+                    preview.append(line)
+
+            if truncated:
+                f.write(f"\n# Transfer dihentikan setelah {count} record (batas tercapai)\n")
+    except BaseException:
+        # File setengah jadi dari transfer yang gagal tidak disimpan
+        for path in (output_file, jsonl_file):
+            if os.path.exists(path):
+                os.remove(path)
+        if capture is not None:
+            capture.rollback()
+        raise
+    finally:
+        records.close()
+    if not count:
+        os.remove(output_file)
+        os.remove(jsonl_file)
+        if capture is not None:
+            capture.rollback()
+        raise ValueError()
+    if capture is not None:
+        capture.commit(complete=not truncated)
+    return count, preview, truncated
+
+def print_zone_transfer(label, output_file, count, preview, truncated):
+    """Menampilkan ringkasan hasil zone transfer di layar (maksimal 10 record)"""
+    # Satu print supaya tidak tercampur dengan output transfer lain yang berjalan
+    lines = [f"\nRecord yang ditemukan dari {label}:"]
+    lines.extend(f"  {line}" for line in preview)
+    if count > len(preview):
+        lines.append(f"  ... dan {count - len(preview)} record lainnya")
+    if truncated:
+        lines.append(f"[!] Transfer dihentikan setelah {count} record karena batas --max-records/--max-bytes")
+    lines.append(f"\n[+] Hasil lengkap disimpan ke {output_file} dan {os.path.splitext(output_file)[0]}.jsonl")
+    print("\n".join(lines))
+
+def write_zone_diff(diff_file, domain, label, base, serial, changes):
+    """Menulis perubahan ('+'/'-', record snapshot) ke file diff dan menampilkan ringkasannya"""
+    added = removed = 0
+    preview = []
+    with open(diff_file, 'w', encoding='utf-8') as f:
+        f.write(f"Perubahan zona {domain} dari {label}: serial {base} -> {serial}\n")
+        f.write(f"Waktu: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}\n")
+        f.write("=" * 60 + "\n\n")
+        for op, (name, rdclass, rdtype, data, ttl) in changes:
+            line = f"{op} {name} {ttl} {rdclass} {rdtype} {data}"
+            f.write(line + "\n")
+            if op == '+':
+                added += 1
+            else:
+                removed += 1
+            if len(preview) < 10:
+                preview.append(line)
+
+    if not added and not removed:
+        os.remove(diff_file)
+        print(f"[*] Tidak ada record yang berubah di {label} (serial {base} -> {serial})")
+        return
+    lines = [f"\nPerubahan dari {label} (serial {base} -> {serial}): {added} ditambah, {removed} dihapus"]
+    lines.extend(f"  {line}" for line in preview)
+    if added + removed > len(preview):
+        lines.append(f"  ... dan {added + removed - len(preview)} perubahan lainnya")
+    lines.append(f"[+] Diff disimpan ke {diff_file}")
+    print("\n".join(lines))
+
+def save_zone_snapshot(records, domain, nameserver, nameserver_ip, label, output_file, snapshots, base,
+                       max_records=None, max_bytes=None, archive=None):
+    """Menyimpan transfer zona lengkap ke file output dan sebagai snapshot baru, lalu menulis diff
+    terhadap snapshot sebelumnya (jika ada). Mengembalikan True jika transfer terpotong"""
+    origin = dns.name.from_text(domain).to_text()
+    transfer = snapshots.begin()
+    serial = []
+
+    def on_record(record):
+        if not serial and record[0] == origin and record[2] == 'SOA':
+            serial.append(int(record[3].split()[2]))
+        snapshots.stage(transfer, record)
+
+    try:
+        result = save_zone_transfer(records, domain, nameserver, nameserver_ip, output_file, max_records, max_bytes,
+                                    on_record, archive)
+        print(f"[+] Zone Transfer berhasil untuk {domain} dari {label}!")
+        print_zone_transfer(label, output_file, *result)
+        if result[2]:
+            print(f"[!] Snapshot {domain} dari {label} tidak diperbarui karena transfer terpotong")
+            return True
+        if base is not None:
+            diff_file = output_file.replace('zone_transfer_', 'zone_diff_', 1)
+            write_zone_diff(diff_file, domain, label, base, serial[0], snapshots.diff(transfer, domain, nameserver_ip))
+        else:
+            print(f"[*] Snapshot pertama untuk {domain} dari {label} disimpan (serial {serial[0]})")
+        snapshots.replace(transfer, domain, nameserver_ip, serial[0])
         return False
+    finally:
+        snapshots.discard(transfer)
+
+def monitor_zone_transfer(domain, nameserver, nameserver_ip, label, output_file, snapshots, port=53, timeout=30,
+                          max_records=None, max_bytes=None, archive=None, connect_timeout=5):
+    """Zone transfer untuk mode monitor: IXFR dari serial snapshot terakhir dan diff record yang
+    ditambah/dihapus. AXFR hanya dipakai jika belum ada snapshot atau server tidak bisa IXFR.
+    Mengembalikan (alasan, file yang ditulis atau None) seperti try_zone_transfer"""
+    origin = dns.name.from_text(domain)
+    base = snapshots.serial(domain, nameserver_ip)
+    if base is not None:
+        try:
+            messages = xfr_messages(nameserver_ip, domain, port, connect_timeout, timeout, dns.rdatatype.IXFR, base)
+            changes = iter_ixfr_changes(messages, origin)
+            serial = next(changes)
+            first = next(changes, None)
+            if first is None:
+                print(f"[*] Zona {domain} di {label} tidak berubah (serial {serial})")
+                return 'unchanged', None
+            if first[0] == '=':
+                # Server menjawab IXFR dengan zona lengkap
+                records = (change[1:] for change in itertools.chain([first], changes))
+                try:
+                    truncated = save_zone_snapshot(records, domain, nameserver, nameserver_ip, label, output_file,
+                                                   snapshots, base, max_records, max_bytes, archive)
+                finally:
+                    changes.close()
+                return 'truncated' if truncated else 'transferred', output_file
+
+            # Efek bersih semua delta per record: '+' baru, '-' dihapus, '~' dihapus
+            # lalu ditambah lagi (hanya TTL yang mungkin berubah)
+            net = {}
+            for op, *record in itertools.chain([first], changes):
+                record = snapshot_record(*record)
+                key = record[:4]
+                previous = net.get(key, (None,))[0]
+                if op == '-':
+                    if previous == '+':
+                        del net[key]
+                    else:
+                        net[key] = ('-', record)
+                elif previous == '-':
+                    net[key] = ('~', record)
+                else:
+                    net[key] = (previous or '+', record)
+            snapshots.apply(domain, nameserver_ip, serial,
+                            [record for op, record in net.values() if op == '-'],
+                            [record for op, record in net.values() if op != '-'])
+            print(f"[+] IXFR berhasil untuk {domain} dari {label} (serial {base} -> {serial})")
+            if archive is not None:
+                # Arsip menyimpan zona lengkap setelah delta, diambil dari snapshot
+                capture = archive.capture(domain, nameserver, nameserver_ip)
+                try:
+                    for record in snapshots.records(domain, nameserver_ip):
+                        capture.add(record)
+                except BaseException:
+                    capture.rollback()
+                    raise
+                capture.commit()
+            diff_file = output_file.replace('zone_transfer_', 'zone_diff_', 1)
+            write_zone_diff(diff_file, domain, label, base, serial,
+                            sorted((op, record) for op, record in net.values() if op != '~'))
+            return 'transferred', diff_file
+        except (dns.xfr.TransferError, dns.xfr.SerialWentBackwards, dns.exception.FormError) as e:
+            print(f"[*] IXFR dari {label} tidak bisa dipakai ({type(e).__name__} - {e}), memakai AXFR")
+
+    messages = xfr_messages(nameserver_ip, domain, port, connect_timeout, timeout)
+    truncated = save_zone_snapshot(iter_xfr_records(messages, origin), domain, nameserver, nameserver_ip, label,
+                                   output_file, snapshots, base, max_records, max_bytes, archive)
+    return 'truncated' if truncated else 'transferred', output_file
+
+def try_zone_transfer(domain, nameserver, cache=None, port=53, nameserver_ip=None, connect_timeout=5, timeout=30,
+                      max_records=None, max_bytes=None, snapshots=None, archive=None):
+    """Mencoba zone transfer dari satu alamat nameserver menggunakan modul dnspython.
+    Mengembalikan (alasan, file hasil atau None); lihat ALLOWED_REASONS"""
+    # Dapatkan IP dari nameserver jika belum diberikan
+    if not nameserver_ip:
+        nameserver_ip = get_nameserver_ip(nameserver, cache)
+    if not nameserver_ip:
+        print(f"[-] Zone Transfer gagal: Tidak dapat mendapatkan IP address untuk {nameserver}")
+        return 'no_address', None
+    label = nameserver if nameserver == nameserver_ip else f"{nameserver} ({nameserver_ip})"
+    print(f"\nMencoba Zone Transfer dari {label} untuk {domain}")
+
+    # Proses dan simpan hasil zone transfer; IP ikut di nama file karena
+    # semua alamat nameserver dicoba bersamaan
+    source = nameserver if nameserver == nameserver_ip else f"{nameserver}_{nameserver_ip.replace(':', '-')}"
+    output_file = f"zone_transfer_{domain}_from_{source}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
+
+    try:
+        if snapshots is not None:
+            return monitor_zone_transfer(domain, nameserver, nameserver_ip, label, output_file, snapshots, port,
+                                         timeout, max_records, max_bytes, archive, connect_timeout)
+        # Connect dibatasi connect_timeout di xfr_messages, supaya server yang tidak bisa
+        # dihubungi gagal cepat tanpa menunggu timeout transfer
+        messages = xfr_messages(nameserver_ip, domain, port, connect_timeout, timeout)
+        result = save_zone_transfer(iter_xfr_records(messages, dns.name.from_text(domain)), domain, nameserver,
+                                    nameserver_ip, output_file, max_records, max_bytes, archive=archive)
+
+        # Jika kode mencapai sini, berarti zone transfer berhasil
+        print(f"[+] Zone Transfer berhasil untuk {domain} dari {label}!")
+        print_zone_transfer(label, output_file, *result)
+        return 'truncated' if result[2] else 'transferred', output_file
+
+    except XfrConnectError as e:
+        print(f"[-] Zone Transfer gagal dari {label}: Tidak dapat terhubung ke port {port} - {e}")
+        return 'connect_failed', None
+    except dns.xfr.TransferError as e:
+        print(f"[-] Zone Transfer gagal dari {label}: Transfer Error - {e}")
+        return 'refused', None
     except dns.exception.Timeout:
-        print(f"[-] Zone Transfer gagal: Timeout - Tidak ada respons dari server dalam waktu yang ditentukan")
-        return False
+        print(f"[-] Zone Transfer gagal dari {label}: Timeout - Tidak ada respons dari server dalam waktu yang ditentukan")
+        return 'timeout', None
     except dns.exception.FormError:
-        print(f"[-] Zone Transfer gagal: Form Error - Server menolak permintaan zone transfer")
-        return False
+        print(f"[-] Zone Transfer gagal dari {label}: Form Error - Server menolak permintaan zone transfer")
+        return 'refused', None
     except socket.gaierror as e:
-        print(f"[-] Zone Transfer gagal: Socket Error - {e}")
-        return False
+        print(f"[-] Zone Transfer gagal dari {label}: Socket Error - {e}")
+        return 'no_address', None
     except ValueError as e:
-        print(f"[-] Zone Transfer gagal: ValueError - {e if str(e) else 'Tidak ada data yang diterima dari server'}")
-        
-        # Coba lagi dengan port 53 yang eksplisit
+        print(f"[-] Zone Transfer gagal dari {label}: ValueError - {e if str(e) else 'Tidak ada data yang diterima dari server'}")
+
+        # Coba lagi dengan port yang eksplisit
         try:
-            print(f"  Mencoba lagi dengan port 53 eksplisit...")
-            zone = dns.zone.from_xfr(dns.query.xfr(nameserver_ip, domain, port=53, timeout=30, lifetime=30))
+            print(f"  Mencoba lagi dengan port {port} eksplisit...")
+            if snapshots is not None:
+                return monitor_zone_transfer(domain, nameserver, nameserver_ip, label, output_file, snapshots, port,
+                                             timeout, max_records, max_bytes, archive, connect_timeout)
+            messages = xfr_messages(nameserver_ip, domain, port, connect_timeout, timeout)
+            result = save_zone_transfer(iter_xfr_records(messages, dns.name.from_text(domain)), domain, nameserver,
+                                        nameserver_ip, output_file, max_records, max_bytes, archive=archive)
             print(f"[+] Zone Transfer berhasil pada percobaan kedua!")
-            # Proses dan simpan hasilnya (kode yang sama dengan di atas)
-            return True
+            print_zone_transfer(label, output_file, *result)
+            return 'truncated' if result[2] else 'transferred', output_file
+        except ValueError:
+            print("  Percobaan kedua juga gagal: Tidak ada data yang diterima dari server")
+            return 'empty', None
+        except dns.exception.Timeout:
+            print("  Percobaan kedua juga gagal: Timeout")
+            return 'timeout', None
+        except XfrConnectError as e2:
+            print(f"  Percobaan kedua juga gagal: Tidak dapat terhubung ke port {port} - {e2}")
+            return 'connect_failed', None
         except Exception as e2:
             print(f"  Percobaan kedua juga gagal: {type(e2).__name__} - {e2}")
-            return False
+            return 'refused' if isinstance(e2, (dns.xfr.TransferError, dns.exception.FormError)) else 'error', None
     except Exception as e:
-        print(f"[-] Zone Transfer gagal: {type(e).__name__} - {e}")
-        return False
+        print(f"[-] Zone Transfer gagal dari {label}: {type(e).__name__} - {e}")
+        return 'error', None
+
+def try_zone_transfers(domain, nameservers, cache=None, port=53, connect_timeout=5, timeout=30, workers=16,
+                       max_records=None, max_bytes=None, snapshots=None, archive=None):
+    """Mencoba zone transfer ke semua alamat (A/AAAA) dari semua nameserver sekaligus.
+    Mengembalikan list (nameserver, ip, alasan, file hasil) dengan alasan dari try_zone_transfer"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+        # Resolve semua nameserver bersamaan, lalu transfer ke setiap alamatnya
+        addresses = list(executor.map(lambda nameserver: get_nameserver_ips(nameserver, cache), nameservers))
+        targets = []
+        for nameserver, nameserver_ips in zip(nameservers, addresses):
+            if nameserver_ips and nameserver_ips != [nameserver]:
+                print(f"  {nameserver}: {', '.join(nameserver_ips)}")
+            targets.extend((nameserver, ip) for ip in nameserver_ips)
+        futures = [
+            executor.submit(try_zone_transfer, domain, nameserver, cache, port, ip, connect_timeout, timeout,
+                            max_records, max_bytes, snapshots, archive)
+            for nameserver, ip in targets
+        ]
+        return [(nameserver, ip, *future.result()) for (nameserver, ip), future in zip(targets, futures)]
+
+def read_domains(path):
+    """Membaca daftar domain dari file (satu domain per baris, baris # diabaikan)"""
+    domains = []
+    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+        for line in f:
+            domain = line.strip().lower().rstrip('.')
+            if domain and not domain.startswith('#') and domain not in domains:
+                domains.append(domain)
+    return domains
+
+def audit_zone_transfers(domains, cache=None, port=53, connect_timeout=5, timeout=30, workers=32, per_nameserver=2,
+                         nameserver=None, max_records=None, max_bytes=None, snapshots=None, archive=None):
+    """Audit zone transfer untuk banyak domain sekaligus. Setiap host nameserver hanya di-resolve sekali
+    walaupun dipakai banyak domain, semua percobaan berjalan di pool yang terbatas, dan satu alamat
+    nameserver paling banyak menerima per_nameserver transfer bersamaan.
+    Mengembalikan list hasil per domain, urut sesuai daftar domain"""
+    lock = threading.Lock()
+    finished = threading.Condition(lock)
+    outstanding = [0]
+    # host nameserver -> [Event, daftar IP]; lookup yang sama dari domain lain menunggu Event
+    addresses = {}
+    # Transfer yang sedang berjalan dan yang menunggu giliran per alamat nameserver
+    active = collections.Counter()
+    waiting = collections.defaultdict(collections.deque)
+    results = {domain: {'domain': domain, 'nameservers': {}, 'transfers': []} for domain in domains}
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=max(1, workers))
+
+    def submit(function, *args):
+        with lock:
+            outstanding[0] += 1
+        executor.submit(run, function, *args)
+
+    def run(function, *args):
+        try:
+            function(*args)
+        except Exception as e:
+            print(f"[-] Audit error untuk {args[0]}: {type(e).__name__} - {e}")
+        finally:
+            with lock:
+                outstanding[0] -= 1
+                if not outstanding[0]:
+                    finished.notify_all()
+
+    def lookup(name):
+        with lock:
+            entry = addresses.get(name)
+            owner = entry is None
+            if owner:
+                entry = addresses[name] = [threading.Event(), []]
+        if owner:
+            try:
+                entry[1] = get_nameserver_ips(name, cache)
+            finally:
+                entry[0].set()
+        else:
+            entry[0].wait()
+        return entry[1]
+
+    def check_domain(domain):
+        names = [nameserver] if nameserver else get_nameservers(domain, cache)
+        if not names:
+            results[domain]['error'] = 'Tidak dapat menemukan nameservers'
+        for name in names:
+            nameserver_ips = lookup(name)
+            results[domain]['nameservers'][name] = nameserver_ips
+            for ip in nameserver_ips:
+                schedule(domain, name, ip)
+
+    def schedule(domain, name, ip):
+        with lock:
+            if active[ip] >= per_nameserver:
+                waiting[ip].append((domain, name, ip))
+                return
+            active[ip] += 1
+        submit(transfer, domain, name, ip)
+
+    def transfer(domain, name, ip):
+        start = time.monotonic()
+        reason, output_file = 'error', None
+        try:
+            reason, output_file = try_zone_transfer(domain, name, cache, port, ip, connect_timeout, timeout,
+                                                    max_records, max_bytes, snapshots, archive)
+        finally:
+            with lock:
+                results[domain]['transfers'].append({
+                    'nameserver': name,
+                    'address': ip,
+                    'allowed': reason in ALLOWED_REASONS,
+                    'reason': reason,
+                    'output': output_file,
+                    'seconds': round(time.monotonic() - start, 3)
+                })
+                # Slot alamat ini langsung dipakai transfer berikutnya yang menunggu
+                next_transfer = waiting[ip].popleft() if waiting[ip] else None
+                if next_transfer is None:
+                    active[ip] -= 1
+            if next_transfer is not None:
+                submit(transfer, *next_transfer)
+
+    try:
+        for domain in domains:
+            submit(check_domain, domain)
+        with lock:
+            while outstanding[0]:
+                finished.wait()
+    finally:
+        executor.shutdown()
+
+    report = []
+    for domain in domains:
+        result = results[domain]
+        result['transfers'].sort(key=lambda item: (item['nameserver'], item['address']))
+        result['allowed'] = any(item['allowed'] for item in result['transfers'])
+        report.append(result)
+    return report
+
+def run_audit(args, cache=None, snapshots=None, archive=None):
+    """Mode batch (-L): audit semua domain di daftar dan simpan satu laporan JSON"""
+    domains = read_domains(args.domain_list)
+    if args.domain and args.domain not in domains:
+        domains.insert(0, args.domain)
+    print(f"Audit DNS Zone Transfer untuk {len(domains)} domain")
+    print("=" * 60)
+
+    start = time.monotonic()
+    results = audit_zone_transfers(domains, cache, args.port, args.connect_timeout, args.timeout, args.workers,
+                                   args.per_ns, args.nameserver, args.max_records, args.max_bytes, snapshots, archive)
+    allowed = [result['domain'] for result in results if result['allowed']]
+    report = {
+        'generated': datetime.now().isoformat(timespec='seconds'),
+        'seconds': round(time.monotonic() - start, 3),
+        'domains': len(results),
+        'nameserver_addresses': len({item['address'] for result in results for item in result['transfers']}),
+        'allowed': allowed,
+        'results': results
+    }
+    report_file = args.report or f"zone_transfer_report_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
+    with open(report_file, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+
+    print(f"\nRingkasan: {len(results)} domain, {report['nameserver_addresses']} alamat nameserver, {report['seconds']} detik")
+    if allowed:
+        print(f"[!] PERHATIAN: Zone Transfer diizinkan untuk {len(allowed)} domain:")
+        for domain in allowed:
+            print(f"  - {domain}")
+    else:
+        print("[-] Tidak ada domain yang mengizinkan zone transfer.")
+    print(f"[+] Laporan lengkap disimpan ke {report_file}")
 
 def check_dependencies():
     """Memeriksa apakah semua modul yang diperlukan tersedia"""
@@ -140,12 +678,44 @@ def main():
         sys.exit(1)
     
     parser = argparse.ArgumentParser(description='DNS Zone Transfer Checker - Fixed')
-    parser.add_argument('domain', help='Domain yang akan dicek (contoh: zonetransfer.me)')
+    parser.add_argument('domain', nargs='?', help='Domain yang akan dicek (contoh: zonetransfer.me)')
+    parser.add_argument('-L', '--domain-list', help='File berisi daftar domain (satu per baris) untuk diaudit sekaligus')
+    parser.add_argument('--per-ns', type=int, default=2, help='Maksimal transfer bersamaan ke satu alamat nameserver pada mode -L (default: 2)')
+    parser.add_argument('--report', help='File laporan JSON untuk mode -L (default: zone_transfer_report_<waktu>.json)')
     parser.add_argument('-n', '--nameserver', help='Nameserver spesifik untuk dicek')
+    parser.add_argument('-p', '--port', type=int, default=53, help='Port DNS nameserver (default: 53)')
+    parser.add_argument('--connect-timeout', type=float, default=5, help='Timeout koneksi TCP ke nameserver dalam detik (default: 5)')
+    parser.add_argument('--timeout', type=float, default=30, help='Timeout transfer dalam detik (default: 30)')
+    parser.add_argument('--max-records', type=int, help='Hentikan transfer setelah sejumlah record ini')
+    parser.add_argument('--max-bytes', type=int, help='Hentikan transfer setelah output teks mencapai ukuran ini (byte)')
+    parser.add_argument('--monitor', action='store_true', help='Simpan snapshot zona dan pakai IXFR dari serial terakhir, tampilkan diff')
+    parser.add_argument('--snapshots', default=DEFAULT_SNAPSHOT_PATH, help='File snapshot zona untuk --monitor')
+    parser.add_argument('--archive', nargs='?', const=DEFAULT_ARCHIVE_PATH,
+                        help=f'Simpan setiap transfer ke arsip zona yang bisa dicari dengan zone_archive.py (default: {DEFAULT_ARCHIVE_PATH})')
+    parser.add_argument('-w', '--workers', type=int, default=16, help='Jumlah transfer yang berjalan bersamaan (default: 16)')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='File cache DNS yang dipakai bersama antar run')
+    parser.add_argument('--no-cache', action='store_true', help='Nonaktifkan cache DNS')
     args = parser.parse_args()
-    
+    if not args.domain and not args.domain_list:
+        parser.error('domain atau --domain-list harus diisi')
+
     domain = args.domain
-    
+    cache = None if args.no_cache else DNSCache(args.cache)
+    snapshots = ZoneSnapshots(args.snapshots) if args.monitor else None
+    archive = ZoneArchive(args.archive) if args.archive else None
+
+    if args.domain_list:
+        try:
+            run_audit(args, cache, snapshots, archive)
+        finally:
+            if cache is not None:
+                cache.close()
+            if snapshots is not None:
+                snapshots.close()
+            if archive is not None:
+                archive.close()
+        return
+
     print(f"Pengecekan DNS Zone Transfer untuk {domain}")
     print("=" * 60)
     
@@ -154,22 +724,39 @@ def main():
     else:
         # Dapatkan semua nameservers untuk domain
         print(f"\nMendapatkan nameservers untuk {domain}...")
-        nameservers = get_nameservers(domain)
+        nameservers = get_nameservers(domain, cache)
         
         if not nameservers:
             print("Tidak dapat menemukan nameservers. Periksa domain dan koneksi internet Anda.")
+            if cache is not None:
+                cache.close()
+            if snapshots is not None:
+                snapshots.close()
+            if archive is not None:
+                archive.close()
             sys.exit(1)
         
         print(f"Nameservers untuk {domain}:")
         for ns in nameservers:
             print(f"  - {ns}")
     
-    # Coba zone transfer untuk setiap nameserver
-    success = False
-    for nameserver in nameservers:
-        if try_zone_transfer(domain, nameserver):
-            success = True
-    
+    # Coba zone transfer ke semua alamat dari semua nameserver sekaligus
+    print("\nAlamat nameserver yang dicoba:")
+    results = try_zone_transfers(domain, nameservers, cache, args.port, args.connect_timeout, args.timeout, args.workers,
+                                 args.max_records, args.max_bytes, snapshots, archive)
+    success = any(reason in ALLOWED_REASONS for _, _, reason, _ in results)
+    if cache is not None:
+        cache.close()
+    if snapshots is not None:
+        snapshots.close()
+    if archive is not None:
+        archive.close()
+
+    if results:
+        print("\nRingkasan:")
+        for nameserver, ip, reason, _ in results:
+            print(f"  {'[+] berhasil' if reason in ALLOWED_REASONS else '[-] gagal   '}  {nameserver} ({ip}): {reason}")
+
     if not success:
         print("\n[-] Semua percobaan zone transfer gagal.")
         print("Ini berarti domain terkonfigurasi dengan baik dari segi keamanan DNS Zone Transfer.")
@@ -0,0 +1,31 @@
+# @title SQLite Store Helpers
+# @markdown Connection setup shared by dns_cache.py, zone_snapshot.py and zone_archive.py
+# @Galang Aprilian - 2025
+import contextlib
+import sqlite3
+import os
+
+def open_database(path):
+    # One connection per store, shared by its threads under the store's own
+    # lock. Autocommit mode, so batches are grouped with transaction();
+    # WAL lets other processes read while a scan is writing.
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+@contextlib.contextmanager
+def transaction(conn):
+    # BEGIN ... COMMIT, rolled back if the block raises so the connection is
+    # never left inside an open transaction
+    conn.execute('BEGIN')
+    try:
+        yield conn
+    except BaseException:
+        if conn.in_transaction:
+            conn.execute('ROLLBACK')
+        raise
+    conn.execute('COMMIT')
@@ -2,28 +2,186 @@
 # @markdown Upload your subdomain .txt file and create a beautiful network visualization
 # @Galang Aprilian - 2025
 
-import matplotlib.pyplot as plt
-import networkx as nx
+import argparse
+import concurrent.futures
+import multiprocessing
 import os
+import sys
+from array import array
 from urllib.parse import urlparse
-import random
 import colorsys
-from google.colab import files
 import io
-import base64
-from IPython.display import HTML, display, Image
 
-# File Upload Section
-uploaded = files.upload()
-file_name = list(uploaded.keys())[0]
+# matplotlib, networkx and the Colab/IPython modules are imported where they
+# are used, so the module can be imported (and spawned into worker
+# processes) without them being loaded at import time
+
+THEMES = ['dark', 'cyberpunk', 'matrix', 'sunset', 'light']
+LAYOUTS = ['spring', 'radial', 'spiral', 'circular', 'tree']
+
+# Above this many nodes the force-directed layouts (O(n^2) and worse) are
+# replaced by the tree layout
+LARGE_GRAPH = 5000
+
+# Public suffixes with more than one label, so the base domain of
+# www.example.co.uk is example.co.uk and not co.uk
+MULTI_LABEL_SUFFIXES = {
+    'co.uk', 'org.uk', 'ac.uk', 'gov.uk', 'net.uk', 'me.uk', 'ltd.uk', 'plc.uk',
+    'com.au', 'net.au', 'org.au', 'edu.au', 'gov.au',
+    'co.id', 'or.id', 'ac.id', 'go.id', 'web.id', 'my.id', 'sch.id', 'net.id', 'biz.id', 'mil.id',
+    'co.jp', 'ne.jp', 'or.jp', 'ac.jp', 'go.jp',
+    'co.nz', 'org.nz', 'net.nz', 'govt.nz',
+    'co.za', 'org.za', 'gov.za',
+    'co.in', 'net.in', 'org.in', 'gov.in', 'ac.in',
+    'co.kr', 'or.kr', 'go.kr', 'ac.kr',
+    'com.br', 'net.br', 'org.br', 'gov.br',
+    'com.cn', 'net.cn', 'org.cn', 'gov.cn', 'edu.cn',
+    'com.sg', 'edu.sg', 'gov.sg', 'com.my', 'edu.my', 'gov.my', 'com.ph', 'gov.ph',
+    'com.tr', 'gov.tr', 'com.mx', 'gob.mx', 'com.ar', 'com.tw', 'com.hk', 'com.vn', 'co.th', 'ac.th',
+}
+
+class DomainTrie:
+    # Label trie over reversed names (com -> example -> www), built in one
+    # pass. Nodes are integer ids in flat arrays: parent, first child and
+    # next sibling links, the label and the number of distinct input names
+    # at or below the node. Every ancestor of an input name exists, whether
+    # or not it was in the input itself.
+    def __init__(self):
+        self.labels = ['']
+        self.parent = array('l', [-1])
+        self.first_child = array('l', [-1])
+        self.next_sibling = array('l', [-1])
+        self.count = array('l', [0])
+        self.terminal = bytearray(1)
+        # (parent id, label) -> child id
+        self.children = {}
+
+    def add(self, name):
+        node = 0
+        for label in reversed(name.lower().rstrip('.').split('.')):
+            child = self.children.get((node, label))
+            if child is None:
+                child = len(self.labels)
+                self.children[(node, label)] = child
+                self.labels.append(sys.intern(label))
+                self.parent.append(node)
+                self.first_child.append(-1)
+                self.next_sibling.append(self.first_child[node])
+                self.first_child[node] = child
+                self.count.append(0)
+                self.terminal.append(0)
+            node = child
+        if not self.terminal[node]:
+            self.terminal[node] = 1
+            while node != -1:
+                self.count[node] += 1
+                node = self.parent[node]
+
+    def iter_children(self, node):
+        child = self.first_child[node]
+        while child != -1:
+            yield child
+            child = self.next_sibling[child]
+
+    def name(self, node):
+        labels = []
+        while node > 0:
+            labels.append(self.labels[node])
+            node = self.parent[node]
+        return '.'.join(labels)
+
+    def base_domain(self):
+        # The registrable domain (one label below a public suffix) holding
+        # the most names, independent of input order
+        best = None
+        for tld in self.iter_children(0):
+            for second in self.iter_children(tld):
+                if f"{self.labels[second]}.{self.labels[tld]}" in MULTI_LABEL_SUFFIXES:
+                    candidates = self.iter_children(second)
+                else:
+                    candidates = (second,)
+                for candidate in candidates:
+                    if best is None or self.count[candidate] > self.count[best]:
+                        best = candidate
+        return best
+
+    def iter_subtree(self, root):
+        # Yields (node, parent node, name, depth below root), parents first
+        stack = [(root, -1, self.name(root), 0)]
+        while stack:
+            node, parent, name, depth = stack.pop()
+            yield node, parent, name, depth
+            for child in self.iter_children(node):
+                stack.append((child, node, f"{self.labels[child]}.{name}", depth + 1))
+
+def in_colab():
+    # The Colab runtime imports google.colab before any cell runs
+    return 'google.colab' in sys.modules
+
+def tree_layout(G, root):
+    # Radial tree layout: depth is the radius and every subtree gets an
+    # angular wedge proportional to its number of leaves. Nodes are numbered
+    # breadth-first, so each level, and the children of each parent within
+    # a level, are contiguous; leaf counts and wedges are then computed one
+    # level at a time with NumPy instead of node by node.
+    import networkx as nx
+    import numpy as np
+
+    nodes = [root]
+    index = {root: 0}
+    parents = [-1]
+    depths = [0]
+    for parent, child in nx.bfs_edges(G, root):
+        index[child] = len(nodes)
+        nodes.append(child)
+        parents.append(index[parent])
+        depths.append(depths[index[parent]] + 1)
+    parent = np.array(parents, dtype=np.int64)
+    depth = np.array(depths, dtype=np.int64)
+    bounds = np.searchsorted(depth, np.arange(depth[-1] + 2))
+
+    # Leaf counts, bottom-up
+    weight = (np.bincount(parent[1:], minlength=len(nodes)) == 0).astype(float)
+    for level in range(depth[-1], 0, -1):
+        members = slice(bounds[level], bounds[level + 1])
+        np.add.at(weight, parent[members], weight[members])
+
+    # Wedges, top-down: children split their parent's wedge in order
+    start = np.zeros(len(nodes))
+    span = np.zeros(len(nodes))
+    span[0] = 2 * np.pi
+    for level in range(1, depth[-1] + 1):
+        members = slice(bounds[level], bounds[level + 1])
+        owner = parent[members]
+        share = weight[members]
+        before = np.cumsum(share) - share
+        first = np.r_[True, owner[1:] != owner[:-1]]
+        before -= before[first][np.cumsum(first) - 1]
+        scale = span[owner] / weight[owner]
+        start[members] = start[owner] + before * scale
+        span[members] = share * scale
+
+    angle = start + span / 2
+    xy = np.column_stack((depth * np.cos(angle), depth * np.sin(angle)))
+    return dict(zip(nodes, xy))
+
+def output_name(input_file):
+    # subdomain_visualization_<input file name without its extension>.png;
+    # only the extension is dropped so a.com_subdomains.txt and
+    # a.org_subdomains.txt do not collide
+    return f"subdomain_visualization_{os.path.splitext(os.path.basename(input_file))[0]}.png"
 
 class SubdomainVisualizer:
-    def __init__(self, input_file, output_file=None, theme='dark', layout='spring'):
+    def __init__(self, input_file, output_file=None, theme='dark', layout='spring', max_labels=200):
+        import networkx as nx
+
         self.input_file = input_file
-        self.output_file = output_file or f"subdomain_visualization_{os.path.basename(input_file).split('.')[0]}.png"
+        self.output_file = output_file or output_name(input_file)
         self.theme = theme
         self.layout_type = layout
+        self.max_labels = max_labels
         self.subdomains = []
+        self.subdomain_count = 0
         self.G = nx.Graph()
         
         # Theme settings
@@ -97,6 +255,15 @@ class SubdomainVisualizer:
             colors.append(hex_color)
         return colors
         
+    def load_subdomains_from_file(self, path=None):
+        try:
+            with open(path or self.input_file, 'rb') as f:
+                content = f.read()
+        except OSError as e:
+            print(f"[-] Error loading subdomains: {e}")
+            return False
+        return self.load_subdomains_from_content(content)
+
     def load_subdomains_from_content(self, content):
         try:
             lines = content.decode('utf-8').splitlines()
@@ -120,84 +287,105 @@ class SubdomainVisualizer:
         if not self.subdomains:
             print("[-] No subdomains loaded")
             return False
-            
-        # Extract base domain from first subdomain
-        parts = self.subdomains[0].split('.')
-        base_domain = '.'.join(parts[-2:])  # e.g., example.com
-        
-        # Add base domain as central node
-        self.G.add_node(base_domain, size=1500, level=0, type='base')
-        
-        levels = {}
-        max_level = 0
-        
-        # Process each subdomain
+
+        trie = DomainTrie()
         for subdomain in self.subdomains:
-            if subdomain == base_domain:
-                continue
-                
-            # Get subdomain parts
-            parts = subdomain.split('.')
-            
-            # Skip if this doesn't match our base domain
-            if len(parts) < 2 or '.'.join(parts[-2:]) != base_domain:
+            trie.add(subdomain)
+        base = trie.base_domain()
+        if base is None:
+            print("[-] No domain names found")
+            return False
+
+        # Add base domain as central node; every node under it is linked to
+        # its real parent, with names missing from the input as intermediates
+        max_level = 0
+        names = {}
+        for node, parent, name, level in trie.iter_subtree(base):
+            names[node] = name
+            if parent == -1:
+                self.G.add_node(name, size=1500, level=0, type='base', count=trie.count[node])
                 continue
-                
-            # Calculate level (depth of subdomain)
-            level = len(parts) - 2
             max_level = max(max_level, level)
-            
-            # Store subdomains by level
-            if level not in levels:
-                levels[level] = []
-            levels[level].append(subdomain)
-            
-            # Add node for this subdomain
-            node_size = 900 / (level + 1)  # Size decreases with level
-            self.G.add_node(subdomain, size=node_size, level=level, type='subdomain')
-            
-            # Create edges based on domain hierarchy
-            if level == 1:
-                # Direct connection to base domain
-                self.G.add_edge(base_domain, subdomain, weight=3)
-            else:
-                # Connect to parent domain
-                parent = '.'.join(parts[1:])
-                if parent in self.G:
-                    self.G.add_edge(parent, subdomain, weight=2)
-                else:
-                    # If parent not in graph, connect to base
-                    self.G.add_edge(base_domain, subdomain, weight=1)
-        
+            node_type = 'subdomain' if trie.terminal[node] else 'intermediate'
+            self.G.add_node(name, size=900 / (level + 1), level=level, type=node_type, count=trie.count[node])
+            self.G.add_edge(names[parent], name, weight=3 if level == 1 else 2)
+
+        self.subdomain_count = trie.count[base] - trie.terminal[base]
+        skipped = trie.count[0] - trie.count[base]
+        if skipped:
+            print(f"[*] Skipped {skipped} names outside {names[base]}")
         print(f"[+] Created graph with {self.G.number_of_nodes()} nodes and {self.G.number_of_edges()} edges")
         print(f"[+] Maximum subdomain depth: {max_level}")
         return True
             
+    def label_nodes(self, nodes, xy):
+        # Level of detail: every node is labelled in small graphs. Otherwise
+        # the base domain comes first, then the busiest and shallowest nodes,
+        # skipping any that would land in a screen cell (about one label wide
+        # and one line high) that already has a label, up to max_labels.
+        if len(nodes) <= self.max_labels:
+            return list(range(len(nodes)))
+        import numpy as np
+
+        low = xy.min(axis=0)
+        extent = np.maximum(xy.max(axis=0) - low, 1e-9)
+        cells = np.floor((xy - low) / extent * (24, 80)).astype(np.int64)
+        ranked = sorted(
+            range(len(nodes)),
+            key=lambda i: (self.G.nodes[nodes[i]]['type'] != 'base', -self.G.degree(nodes[i]), self.G.nodes[nodes[i]]['level'])
+        )
+        taken = set()
+        labels = []
+        for i in ranked:
+            cell = (cells[i, 0], cells[i, 1])
+            if cell in taken:
+                continue
+            taken.add(cell)
+            labels.append(i)
+            if len(labels) >= self.max_labels:
+                break
+        return labels
+
     def create_visualization(self):
         if not self.G.nodes():
             print("[-] Graph is empty, nothing to visualize")
             return False
+
+        import matplotlib.pyplot as plt
+        from matplotlib.collections import LineCollection
+        import networkx as nx
+        import numpy as np
             
         # Get theme settings
         theme = self.themes.get(self.theme, self.themes['dark'])
         
         # Setup figure with proper DPI for high quality
-        plt.figure(figsize=(16, 12), facecolor=theme['bg_color'], dpi=300)
+        fig = plt.figure(figsize=(16, 12), facecolor=theme['bg_color'], dpi=300)
         
         # Select layout algorithm
-        if self.layout_type == 'spring':
+        layout_type = self.layout_type
+        if layout_type in ('spring', 'radial') and self.G.number_of_nodes() > LARGE_GRAPH:
+            print(f"[*] {self.G.number_of_nodes()} nodes: using the tree layout instead of {layout_type}")
+            layout_type = 'tree'
+        if layout_type == 'tree':
+            root = next((node for node, data in self.G.nodes(data=True) if data['type'] == 'base'), None)
+            pos = tree_layout(self.G, root)
+            plt.gca().set_aspect('equal')
+        elif layout_type == 'spring':
             pos = nx.spring_layout(self.G, k=0.3, iterations=50, seed=42)
-        elif self.layout_type == 'radial':
+        elif layout_type == 'radial':
             pos = nx.kamada_kawai_layout(self.G)
-        elif self.layout_type == 'spiral':
+        elif layout_type == 'spiral':
             pos = nx.spiral_layout(self.G)
-        elif self.layout_type == 'circular':
+        elif layout_type == 'circular':
             pos = nx.circular_layout(self.G)
         else:
             pos = nx.spring_layout(self.G, k=0.3, iterations=50, seed=42)
         
-        # Prepare node styling
-        node_sizes = [self.G.nodes[node]['size'] for node in self.G.nodes()]
+        # Prepare node styling; nodes shrink as the graph grows so large maps stay readable
+        nodes = list(self.G.nodes())
+        scale = min(1.0, 50 / len(nodes) ** 0.5)
+        node_sizes = [self.G.nodes[node]['size'] * scale for node in nodes]
         
         # Color nodes by level
         node_colors = []
@@ -206,41 +394,47 @@ class SubdomainVisualizer:
             color_idx = min(level, len(theme['node_colors'])-1)
             node_colors.append(theme['node_colors'][color_idx])
         
-        # Draw edges with alpha for better visualization
-        nx.draw_networkx_edges(
-            self.G, pos, 
+        # Draw edges and nodes as one collection each instead of per-item artists
+        ax = plt.gca()
+        index = {node: i for i, node in enumerate(nodes)}
+        xy = np.array([pos[node] for node in nodes], dtype=float)
+        edges = np.array([(index[u], index[v]) for u, v in self.G.edges()], dtype=np.int64).reshape(-1, 2)
+        ax.add_collection(LineCollection(
+            xy[edges],
             alpha=theme['alpha'],
-            edge_color=theme['edge_color'],
-            width=0.8
-        )
+            colors=theme['edge_color'],
+            linewidths=0.8,
+            zorder=1
+        ))
         
-        # Draw nodes with custom colors and sizes
-        nx.draw_networkx_nodes(
-            self.G, pos,
-            node_size=node_sizes,
-            node_color=node_colors,
+        ax.scatter(
+            xy[:, 0], xy[:, 1],
+            s=node_sizes,
+            c=node_colors,
             alpha=0.9,
             edgecolors=theme['edge_color'],
-            linewidths=0.5
+            # Outlines cost more than the markers themselves on large maps
+            linewidths=0.5 if len(nodes) <= LARGE_GRAPH else 0,
+            zorder=2
         )
         
-        # Draw labels for important nodes only (base domain and first level)
-        important_nodes = {node: node for node in self.G.nodes()}
-        
-        nx.draw_networkx_labels(
-            self.G, pos,
-            labels=important_nodes,
-            font_size=7,
-            font_color=theme['font_color'],
-            font_weight='bold'
-        )
+        # Draw labels for important nodes only
+        for i in self.label_nodes(nodes, xy):
+            x, y = xy[i]
+            ax.text(
+                x, y, nodes[i],
+                fontsize=7,
+                color=theme['font_color'],
+                fontweight='bold',
+                ha='center', va='center',
+                zorder=3
+            )
         
         # Add a legend for different levels
         legend_elements = []
         
         # Add title with total count
-        subdomain_count = len(self.G.nodes()) - 1  # Subtract 1 for base domain
-        plt.suptitle(f"Subdomain Network: {subdomain_count} subdomains", 
+        plt.suptitle(f"Subdomain Network: {self.subdomain_count} subdomains", 
                   fontsize=16, color=theme['font_color'], y=0.98)
         
         # Add source file info
@@ -250,73 +444,146 @@ class SubdomainVisualizer:
         plt.axis('off')
         plt.tight_layout()
         
-        # Save the figure to a BytesIO object
+        # Render once to a BytesIO object and write the same bytes to the file
         img_data = io.BytesIO()
-        plt.savefig(img_data, format='png', facecolor=theme['bg_color'], bbox_inches='tight', dpi=300)
+        # fig.savefig: pyplot.savefig redraws the whole figure again afterwards
+        fig.savefig(img_data, format='png', facecolor=theme['bg_color'], bbox_inches='tight', dpi=300)
+        plt.close()
         img_data.seek(0)
         
-        # Also save to file
-        plt.savefig(self.output_file, facecolor=theme['bg_color'], bbox_inches='tight', dpi=300)
+        output_dir = os.path.dirname(self.output_file)
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        with open(self.output_file, 'wb') as f:
+            f.write(img_data.getvalue())
         print(f"[+] Visualization saved to {self.output_file}")
         
         return img_data
 
-# Add interactive widgets for theme and layout selection
-import ipywidgets as widgets
-from IPython.display import display
-
-# @title Visualization Options
-theme = widgets.Dropdown(
-    options=['dark', 'cyberpunk', 'matrix', 'sunset', 'light'],
-    value='dark',
-    description='Theme:',
-)
-display(theme)
-
-layout = widgets.Dropdown(
-    options=['spring', 'radial', 'spiral', 'circular'],
-    value='spring',
-    description='Layout:',
-)
-display(layout)
-
-# Function to run visualization
-def run_visualization(b):
-    # Clear output for cleaner display
-    from IPython.display import clear_output
-    clear_output(wait=True)
-    
-    print(f"Processing file: {file_name}")
-    print(f"Selected theme: {theme.value}")
-    print(f"Selected layout: {layout.value}")
+def render_file(input_file, output_dir=None, theme='dark', layout='spring', max_labels=200):
+    # Renders one subdomain file; returns the image path, or None if nothing
+    # could be drawn. Module-level so it can run in a worker process.
+    output_file = os.path.join(output_dir, output_name(input_file)) if output_dir else None
+    visualizer = SubdomainVisualizer(input_file, output_file, theme, layout, max_labels)
+    if not visualizer.load_subdomains_from_file() or not visualizer.analyze_structure():
+        return None
+    if not visualizer.create_visualization():
+        return None
+    return visualizer.output_file
+
+def init_render_worker():
+    # Worker processes have no display: draw straight to image files. Only
+    # the spawned workers switch backend; in-process callers keep theirs.
+    import matplotlib
+    matplotlib.use('Agg')
+
+def render_files(input_files, output_dir=None, theme='dark', layout='spring', workers=None, max_labels=200):
+    # Renders independent files in parallel on a process pool. Returns
+    # {input file: image path or None} in input order.
+    workers = min(workers or os.cpu_count() or 1, len(input_files))
+    if workers <= 1:
+        return {input_file: render_file(input_file, output_dir, theme, layout, max_labels) for input_file in input_files}
+
+    results = dict.fromkeys(input_files)
+    context = multiprocessing.get_context('spawn')
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers, mp_context=context,
+                                                initializer=init_render_worker) as executor:
+        futures = {
+            executor.submit(render_file, input_file, output_dir, theme, layout, max_labels): input_file
+            for input_file in input_files
+        }
+        for future in concurrent.futures.as_completed(futures):
+            input_file = futures[future]
+            try:
+                results[input_file] = future.result()
+            except Exception as e:
+                print(f"[-] Error rendering {input_file}: {type(e).__name__} - {e}")
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description='Render subdomain network maps from subdomain .txt files')
+    parser.add_argument('files', nargs='+', help='Subdomain files (one subdomain per line)')
+    parser.add_argument('-o', '--output-dir', help='Directory for the PNG files (default: current directory)')
+    parser.add_argument('-t', '--theme', choices=THEMES, default='dark', help='Color theme')
+    parser.add_argument('-l', '--layout', choices=LAYOUTS, default='spring', help='Graph layout')
+    parser.add_argument('-w', '--workers', type=int, help='Worker processes (default: number of CPUs)')
+    parser.add_argument('--max-labels', type=int, default=200, help='Label at most this many nodes (every node in smaller graphs)')
+    args = parser.parse_args()
+
+    results = render_files(args.files, args.output_dir, args.theme, args.layout, args.workers, args.max_labels)
+    rendered = [path for path in results.values() if path]
+    print(f"[*] Rendered {len(rendered)} of {len(results)} files")
+    if len(rendered) < len(results):
+        sys.exit(1)
+
+def run_colab():
+    # Interactive upload and widgets for the Colab notebook
+    import ipywidgets as widgets
+    from google.colab import files
+    from IPython.display import display, Image
+
+    # File Upload Section
+    uploaded = files.upload()
+    file_name = list(uploaded.keys())[0]
+
+    # @title Visualization Options
+    theme = widgets.Dropdown(
+        options=THEMES,
+        value='dark',
+        description='Theme:',
+    )
+    display(theme)
     
-    # Create visualizer
-    visualizer = SubdomainVisualizer(
-        input_file=file_name,
-        theme=theme.value,
-        layout=layout.value
+    layout = widgets.Dropdown(
+        options=LAYOUTS,
+        value='spring',
+        description='Layout:',
     )
+    display(layout)
     
-    # Load and process subdomains
-    if visualizer.load_subdomains_from_content(uploaded[file_name]):
-        visualizer.analyze_structure()
-        img_data = visualizer.create_visualization()
+    # Function to run visualization
+    def run_visualization(b):
+        # Clear output for cleaner display
+        from IPython.display import clear_output
+        clear_output(wait=True)
         
-        # Display the image
-        display(Image(data=img_data.getvalue()))
+        print(f"Processing file: {file_name}")
+        print(f"Selected theme: {theme.value}")
+        print(f"Selected layout: {layout.value}")
         
-        # Provide download button
-        files.download(visualizer.output_file)
-
-# Create and display the run button
-run_button = widgets.Button(
-    description='Generate Visualization',
-    button_style='success',
-    tooltip='Click to generate the visualization'
-)
-run_button.on_click(run_visualization)
-display(run_button)
-
-# Display filename
-print(f"Uploaded file: {file_name}")
-print("Select options above and click 'Generate Visualization' to create subdomain network map")
\ No newline at end of file
+        # Create visualizer
+        visualizer = SubdomainVisualizer(
+            input_file=file_name,
+            theme=theme.value,
+            layout=layout.value
+        )
+        
+        # Load and process subdomains
+        if visualizer.load_subdomains_from_content(uploaded[file_name]):
+            visualizer.analyze_structure()
+            img_data = visualizer.create_visualization()
+            
+            # Display the image
+            display(Image(data=img_data.getvalue()))
+            
+            # Provide download button
+            files.download(visualizer.output_file)
+    
+    # Create and display the run button
+    run_button = widgets.Button(
+        description='Generate Visualization',
+        button_style='success',
+        tooltip='Click to generate the visualization'
+    )
+    run_button.on_click(run_visualization)
+    display(run_button)
+    
+    # Display filename
+    print(f"Uploaded file: {file_name}")
+    print("Select options above and click 'Generate Visualization' to create subdomain network map")
+
+if __name__ == "__main__":
+    if in_colab():
+        run_colab()
+    else:
+        main()
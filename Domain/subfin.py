@@ -2,26 +2,1612 @@
 # @markdown Use: python subfin.py <domain> <wordlist> <output> <threads> <timeout>
 # @Galang Aprilian - 2025
 import dns.resolver
+import dns.asyncresolver
+import dns.exception
+import dns.message
+import dns.name
+import dns.rcode
+import dns.rdataclass
+import dns.rdatatype
 import requests
+import requests.adapters
 import argparse
 import concurrent.futures
+import asyncio
+import bisect
+import http.server
+import selectors
+import socket
+import struct
+import codecs
+import collections
+import hashlib
+import heapq
+import json
+import math
+import multiprocessing
+import queue
 import re
 import os
 import time
 import random
+import string
+import sys
+import tempfile
+import threading
 from datetime import datetime
+from email.utils import parsedate_to_datetime
+from dns_cache import DNSCache, DEFAULT_CACHE_PATH, cached_resolve, cached_resolve_async, negative_ttl
+
+class BloomFilter:
+    # Compact probabilistic set used to drop duplicates from huge streams
+    # without keeping every string in memory. Sized for `capacity` items at
+    # `error_rate`; beyond that the false-positive rate climbs, which is why
+    # callers go through ScalableBloomFilter.
+    def __init__(self, capacity, error_rate=1e-6):
+        self.capacity = max(1, capacity)
+        self.size = self.bits_for(self.capacity, error_rate)
+        self.hashes = max(1, round(self.size / self.capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    @staticmethod
+    def bits_for(capacity, error_rate):
+        return max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+
+    @staticmethod
+    def digest(item):
+        digest = hashlib.blake2b(item.encode('utf-8', 'ignore'), digest_size=24).digest()
+        return (int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:16], 'little'),
+                int.from_bytes(digest[16:], 'little'))
+
+    def _positions(self, hashes):
+        # Triple hashing: plain double hashing (h1 + i * h2) repeats probe
+        # patterns often enough in small filters to miss the error rate
+        h1, h2, h3 = hashes
+        return [(h1 + i * h2 + i * i * h3) % self.size for i in range(self.hashes)]
+
+    def add(self, item, hashes=None):
+        # Returns True when the item was (probably) already present
+        present = True
+        for position in self._positions(hashes or self.digest(item)):
+            mask = 1 << (position & 7)
+            if not self.bits[position >> 3] & mask:
+                present = False
+                self.bits[position >> 3] |= mask
+        if not present:
+            self.count += 1
+        return present
+
+    def contains(self, hashes):
+        # Probes lazily: most absent items stop at the first clear bit
+        h1, h2, h3 = hashes
+        bits = self.bits
+        size = self.size
+        for i in range(self.hashes):
+            position = (h1 + i * h2 + i * i * h3) % size
+            if not bits[position >> 3] & (1 << (position & 7)):
+                return False
+        return True
+
+    def __contains__(self, item):
+        return self.contains(self.digest(item))
+
+class ScalableBloomFilter:
+    # Chain of Bloom filters (Almeida et al., "Scalable Bloom Filters"): when
+    # the newest filter reaches its capacity a filter twice as large with half
+    # the error rate is added, so the combined false-positive rate stays below
+    # error_rate no matter how many items arrive. Once the next filter would
+    # exceed max_bytes the chain stops growing and new items are no longer
+    # recorded: add() reports them as new, so a duplicate costs an extra
+    # query instead of a real name being dropped.
+    def __init__(self, capacity=10000, error_rate=1e-6, max_bytes=256 * 1024 * 1024, name='dedupe filter'):
+        self.error_rate = error_rate / 2
+        self.max_bytes = max_bytes
+        self.name = name
+        # The first filter takes at most half the budget
+        while capacity > 1000 and BloomFilter.bits_for(capacity, self.error_rate) // 8 > max_bytes // 2:
+            capacity //= 2
+        self.filters = [BloomFilter(capacity, self.error_rate)]
+        self.used = len(self.filters[0].bits)
+        self.saturated = False
+        self.unrecorded = 0
+
+    def __len__(self):
+        return sum(bloom.count for bloom in self.filters)
+
+    def __contains__(self, item):
+        hashes = BloomFilter.digest(item)
+        return any(bloom.contains(hashes) for bloom in self.filters)
+
+    def add(self, item):
+        # Returns True when the item was (probably) already present
+        hashes = BloomFilter.digest(item)
+        if any(bloom.contains(hashes) for bloom in self.filters):
+            return True
+        current = self.filters[-1]
+        if current.count >= current.capacity and not self.saturated:
+            capacity = current.capacity * 2
+            error_rate = self.error_rate / 2 ** len(self.filters)
+            size = (BloomFilter.bits_for(capacity, error_rate) + 7) // 8
+            if self.used + size <= self.max_bytes:
+                current = BloomFilter(capacity, error_rate)
+                self.filters.append(current)
+                self.used += size
+            else:
+                self.saturated = True
+                print(f"[!] {self.name.capitalize()} reached its {self.max_bytes // (1024 * 1024)} MiB limit after "
+                      f"{len(self)} entries; later duplicates are no longer filtered and may be queried again")
+        if self.saturated:
+            self.unrecorded += 1
+            return False
+        current.add(item, hashes)
+        return False
+
+class Checkpoint:
+    # Periodic on-disk snapshot of a brute-force run: the wordlist position
+    # below which every word has been resolved, plus everything found so far
+    def __init__(self, path, interval=30):
+        self.path = path
+        self.interval = interval
+        self.lock = threading.Lock()
+        # candidate name -> wordlist offsets (ascending), for words read but not
+        # resolved yet; a name can be in flight more than once, e.g. from
+        # words that differ only in case
+        self.inflight = {}
+        self.read_position = 0
+        # Names of the passive searches that completed successfully
+        self.passive_done = set()
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        except FileNotFoundError:
+            return None
+        self.read_position = state.get('position', 0)
+        done = state.get('passive_done', [])
+        # Older checkpoints store a single flag for all sources
+        self.passive_done = True if done is True else set(done or ())
+        return state
+
+    def begin(self, name, start, end):
+        with self.lock:
+            self.inflight.setdefault(name, []).append(start)
+            self.read_position = end
+
+    def done(self, name):
+        # Either entry of a repeated name may finish first; dropping the
+        # latest offset keeps the earliest one until the last entry is done
+        with self.lock:
+            offsets = self.inflight.get(name)
+            if offsets:
+                offsets.pop()
+                if not offsets:
+                    del self.inflight[name]
+
+    def position(self):
+        # Words still in flight are re-queried on resume, so at most the
+        # pipeline's queues plus one engine window are repeated
+        with self.lock:
+            return min(offsets[0] for offsets in self.inflight.values()) if self.inflight else self.read_position
+
+    def save(self, finder):
+        # Results are flushed first so everything the checkpoint lists as
+        # found is also in the JSONL file
+        if finder.results is not None:
+            finder.results.flush()
+        state = {
+            'domain': finder.domain,
+            'wordlist': finder.wordlist_file,
+            'output': finder.output_file,
+            'jsonl': finder.results.path if finder.results is not None else None,
+            'position': self.position(),
+            'passive_done': sorted(self.passive_done | finder.passive_completed()),
+            'subdomains': sorted(finder.subdomains),
+            'updated': datetime.now().isoformat(timespec='seconds')
+        }
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.path)
+
+    def start(self, finder):
+        def loop():
+            while not self.stop_event.wait(self.interval):
+                try:
+                    self.save(finder)
+                except Exception as e:
+                    print(f"[-] Error saving checkpoint: {e}")
+
+        self.thread = threading.Thread(target=loop, daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join()
+
+    def remove(self):
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class Histogram:
+    # Log-bucketed histogram (each bucket 20% wider than the previous one);
+    # percentiles are accurate to one bucket
+    BOUNDS = [0.0001 * 1.2 ** i for i in range(70)]
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        target = q * self.count
+        cumulative = 0
+        for bound, count in zip(self.BOUNDS, self.counts):
+            cumulative += count
+            if cumulative >= target:
+                return bound
+        return self.BOUNDS[-1]
+
+class Metrics:
+    # Counters, histograms and gauges for a run. Exposed as periodic JSON
+    # lines on stderr and/or a Prometheus text endpoint on localhost.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = collections.defaultdict(int)
+        self.histograms = {}
+        # (name, labels) -> function returning the current value
+        self.gauges = {}
+        self.started = time.time()
+        self.stop_event = threading.Event()
+        self.server = None
+
+    @staticmethod
+    def _key(name, labels):
+        return name, tuple(sorted(labels.items()))
+
+    @staticmethod
+    def _format(key):
+        name, labels = key
+        if not labels:
+            return name
+        return name + '{' + ','.join(f'{label}="{value}"' for label, value in labels) + '}'
+
+    def inc(self, name, value=1, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            self.counters[key] += value
+
+    def observe(self, name, value, **labels):
+        key = self._key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def gauge(self, name, function, **labels):
+        self.gauges[self._key(name, labels)] = function
+
+    def _gauge_values(self):
+        values = {}
+        for key, function in list(self.gauges.items()):
+            try:
+                values[key] = function()
+            except Exception:
+                pass
+        return values
+
+    def snapshot(self):
+        with self.lock:
+            counters = {self._format(key): value for key, value in self.counters.items()}
+            histograms = {
+                self._format(key): {
+                    'count': histogram.count,
+                    'sum': round(histogram.sum, 6),
+                    'p50': histogram.percentile(0.5),
+                    'p90': histogram.percentile(0.9),
+                    'p99': histogram.percentile(0.99)
+                }
+                for key, histogram in self.histograms.items()
+            }
+        return {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            'elapsed': round(time.time() - self.started, 3),
+            'counters': counters,
+            'gauges': {self._format(key): value for key, value in self._gauge_values().items()},
+            'histograms': histograms
+        }
+
+    def prometheus(self):
+        lines = []
+        with self.lock:
+            for key, value in sorted(self.counters.items()):
+                lines.append(f"subfin_{self._format(key)} {value}")
+            for (name, labels), histogram in sorted(self.histograms.items()):
+                cumulative = 0
+                for bound, count in zip(Histogram.BOUNDS, histogram.counts):
+                    cumulative += count
+                    lines.append(f"subfin_{self._format((name + '_bucket', labels + (('le', f'{bound:.6g}'),)))} {cumulative}")
+                lines.append(f"subfin_{self._format((name + '_bucket', labels + (('le', '+Inf'),)))} {histogram.count}")
+                lines.append(f"subfin_{self._format((name + '_sum', labels))} {histogram.sum}")
+                lines.append(f"subfin_{self._format((name + '_count', labels))} {histogram.count}")
+        for key, value in sorted(self._gauge_values().items()):
+            lines.append(f"subfin_{self._format(key)} {value}")
+        return '\n'.join(lines) + '\n'
+
+    def start_reporter(self, interval, stream=None):
+        def loop():
+            while not self.stop_event.wait(interval):
+                print(json.dumps(self.snapshot()), file=stream or sys.stderr, flush=True)
+
+        threading.Thread(target=loop, daemon=True).start()
+
+    def serve(self, port, host='127.0.0.1'):
+        metrics = self
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path not in ('/', '/metrics'):
+                    self.send_error(404)
+                    return
+                body = metrics.prometheus().encode()
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = http.server.ThreadingHTTPServer((host, port), Handler)
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        print(f"[*] Serving metrics on http://{host}:{self.server.server_address[1]}/metrics")
+
+    def stop(self):
+        self.stop_event.set()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+class ResultSink:
+    # Append-only JSONL file of discovered names with their record data,
+    # written in batches while the run is going instead of at the end. The
+    # file is only held open while a batch is written, so batch scans can
+    # keep one sink per domain.
+    def __init__(self, path, append=False, buffer_size=1000):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.buffer = []
+        self.lock = threading.Lock()
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        if not append:
+            open(path, 'w').close()
+
+    def write(self, name, source, addresses=(), ttl=None, status='NOERROR'):
+        record = {
+            'name': name,
+            'records': {'A': sorted(addresses)} if addresses else {},
+            'ttl': ttl,
+            'status': status,
+            'source': source,
+            'first_seen': datetime.now().isoformat(timespec='seconds')
+        }
+        line = json.dumps(record)
+        with self.lock:
+            self.buffer.append(line)
+            if len(self.buffer) >= self.buffer_size:
+                self._flush()
+
+    def _flush(self):
+        if not self.buffer:
+            return
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write('\n'.join(self.buffer) + '\n')
+        self.buffer.clear()
+
+    def flush(self):
+        with self.lock:
+            self._flush()
+
+    def names(self):
+        self.flush()
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                try:
+                    yield json.loads(line)['name']
+                except (ValueError, KeyError):
+                    # A line cut short by a crash is skipped
+                    continue
+
+def external_sort(lines, output_path, chunk_size=1000000):
+    # Writes the sorted, de-duplicated lines to output_path without holding
+    # them all in memory: sorted runs of chunk_size lines are spilled to
+    # temporary files and merged. Returns the number of lines written.
+    runs = []
+    chunk = []
+
+    def spill():
+        chunk.sort()
+        run = tempfile.TemporaryFile('w+', encoding='utf-8')
+        run.writelines(f"{line}\n" for line in chunk)
+        run.seek(0)
+        runs.append(run)
+        chunk.clear()
+
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            spill()
+    if runs:
+        if chunk:
+            spill()
+        merged = heapq.merge(*((line.rstrip('\n') for line in run) for run in runs))
+    else:
+        chunk.sort()
+        merged = chunk
+    count = 0
+    previous = None
+    try:
+        with open(output_path, 'w') as f:
+            for line in merged:
+                if line != previous:
+                    f.write(f"{line}\n")
+                    count += 1
+                    previous = line
+    finally:
+        for run in runs:
+            run.close()
+    return count
+
+class CandidateQueue:
+    # Bounded hand-off between pipeline stages. put() blocks while the queue is
+    # full, which is what propagates backpressure upstream; close() marks the
+    # end of input for every consumer.
+    EMPTY = object()
+    DONE = object()
+
+    def __init__(self, maxsize=10000):
+        self.queue = queue.Queue(maxsize)
+
+    def put(self, item):
+        self.queue.put(item)
+
+    def close(self):
+        self.queue.put(self.DONE)
+
+    def _reoffer(self, item):
+        # Leave the end marker in place for the other consumers
+        if item is self.DONE:
+            self.queue.put(item)
+        return item
+
+    def get(self):
+        return self._reoffer(self.queue.get())
+
+    def get_nowait(self):
+        try:
+            return self._reoffer(self.queue.get_nowait())
+        except queue.Empty:
+            return self.EMPTY
+
+    def get_batch(self, size):
+        # Blocks for the first item only; returns [] once the queue is closed
+        batch = []
+        item = self.get()
+        while item is not self.DONE:
+            batch.append(item)
+            if len(batch) >= size:
+                break
+            item = self.get_nowait()
+            if item is self.EMPTY:
+                break
+        return batch
+
+    def qsize(self):
+        return self.queue.qsize()
+
+    def __iter__(self):
+        while True:
+            item = self.get()
+            if item is self.DONE:
+                return
+            yield item
+
+class UpstreamResolver:
+    def __init__(self, address, port=53, timeout=1.0, initial_limit=32):
+        self.address = address
+        self.port = port
+        self.resolver = dns.resolver.Resolver(configure=False)
+        self.async_resolver = dns.asyncresolver.Resolver(configure=False)
+        for resolver in (self.resolver, self.async_resolver):
+            resolver.nameservers = [address]
+            resolver.port = port
+            resolver.timeout = timeout
+            resolver.lifetime = timeout
+        self.timeout = timeout
+        self.family = socket.AF_INET6 if ':' in address else socket.AF_INET
+        self.inflight = 0
+        # AIMD in-flight limit, kept as a float so additive increase can be
+        # spread over a whole window of successes
+        self.limit = float(initial_limit)
+        # Time of the last multiplicative decrease
+        self.decreased = float('-inf')
+        # Exponentially weighted moving averages
+        self.latency = None
+        self.timeout_rate = 0.0
+        self.servfail_rate = 0.0
+        self.queries = 0
+
+    def score(self):
+        # Lower is better; resolvers without samples go first so they get
+        # measured, resolvers that never answered count as timing out
+        if self.queries == 0:
+            return 0.0
+        latency = self.latency if self.latency is not None else self.timeout
+        return latency * (1 + 10 * self.timeout_rate + 10 * self.servfail_rate)
+
+    def __str__(self):
+        return self.address if self.port == 53 else f"{self.address}:{self.port}"
+
+class ResolverPool:
+    # Spreads queries over several upstream resolvers. Each one is scored by
+    # latency, timeout rate and SERVFAIL rate, its in-flight limit is tuned
+    # AIMD-style, and failed queries are retried on a different resolver.
+    EWMA_WEIGHT = 0.05
+    EXPLORE_RATE = 0.02
+
+    def __init__(self, nameservers, port=53, timeout=1.0, retries=3, initial_limit=32, max_limit=1024):
+        self.upstreams = []
+        for entry in nameservers:
+            address, upstream_port = self.parse_address(entry, port)
+            self.upstreams.append(UpstreamResolver(address, upstream_port, timeout, initial_limit))
+        if not self.upstreams:
+            raise ValueError('ResolverPool needs at least one nameserver')
+        self.retries = retries
+        self.max_limit = max_limit
+        self.condition = threading.Condition()
+        self.metrics = None
+        # (loop, future) of coroutines waiting for capacity, woken one per
+        # release; guarded by the condition
+        self.async_waiters = collections.deque()
+
+    @staticmethod
+    def parse_address(entry, default_port=53):
+        # Accepts 1.1.1.1, 1.1.1.1:5353, 2001:db8::1 and [2001:db8::1]:5353
+        entry = entry.strip()
+        if entry.startswith('['):
+            address, _, port = entry[1:].partition(']')
+            return address, int(port.lstrip(':') or default_port)
+        if entry.count(':') == 1:
+            address, port = entry.split(':')
+            return address, int(port)
+        return entry, default_port
+
+    def addresses(self):
+        # Upstreams in the form accepted by the constructor, e.g. for worker processes
+        return [f"[{up.address}]:{up.port}" if up.family == socket.AF_INET6 else f"{up.address}:{up.port}"
+                for up in self.upstreams]
+
+    @classmethod
+    def from_argument(cls, value, **kwargs):
+        # -r takes either a comma separated list or a file with one resolver per line
+        if os.path.isfile(value):
+            with open(value, 'r') as f:
+                entries = [line.split('#')[0].strip() for line in f]
+        else:
+            entries = value.split(',')
+        return cls([entry for entry in entries if entry.strip()], **kwargs)
+
+    def share_limit(self, total):
+        # Starting in-flight limit: the engine's concurrency split over the
+        # upstreams. Upstreams that already have samples keep their limit.
+        with self.condition:
+            limit = min(self.max_limit, max(1.0, total / len(self.upstreams)))
+            for up in self.upstreams:
+                if up.queries == 0:
+                    up.limit = float(limit)
+            self.condition.notify_all()
+
+    def choose(self, exclude=(), respect_limits=False, weighted=False):
+        if len(self.upstreams) == 1 and not respect_limits:
+            return self.upstreams[0]
+        candidates = [up for up in self.upstreams if up not in exclude] or self.upstreams
+        if respect_limits:
+            candidates = [up for up in candidates if up.inflight < int(up.limit)]
+            if not candidates:
+                return None
+        if random.random() < self.EXPLORE_RATE:
+            return random.choice(candidates)
+        if weighted:
+            # Without in-flight limits to spread the load (bulk mode), pick
+            # upstreams in proportion to how well they score
+            return random.choices(candidates, weights=[1 / (up.score() + 0.001) for up in candidates])[0]
+        return min(candidates, key=lambda up: (up.score(), up.inflight / up.limit))
+
+    def try_acquire(self, exclude=()):
+        with self.condition:
+            upstream = self.choose(exclude, respect_limits=True)
+            if upstream is not None:
+                upstream.inflight += 1
+            return upstream
+
+    def acquire(self, exclude=()):
+        with self.condition:
+            while True:
+                upstream = self.choose(exclude, respect_limits=True)
+                if upstream is not None:
+                    upstream.inflight += 1
+                    return upstream
+                self.condition.wait()
+
+    async def acquire_async(self, exclude=()):
+        loop = asyncio.get_running_loop()
+        while True:
+            with self.condition:
+                upstream = self.choose(exclude, respect_limits=True)
+                if upstream is not None:
+                    upstream.inflight += 1
+                    return upstream
+                waiter = loop.create_future()
+                self.async_waiters.append((loop, waiter))
+            await waiter
+
+    @staticmethod
+    def _wake(waiter):
+        if not waiter.done():
+            waiter.set_result(None)
+
+    def record(self, upstream, outcome, latency=None, sent=None):
+        # outcome is 'ok', 'timeout' or 'servfail'; sent is the monotonic time
+        # the query went out
+        if self.metrics is not None:
+            self.metrics.inc('dns_queries_total', resolver=str(upstream), outcome=outcome)
+            if latency is not None:
+                self.metrics.observe('dns_query_seconds', latency, resolver=str(upstream))
+        w = self.EWMA_WEIGHT
+        upstream.queries += 1
+        upstream.timeout_rate += w * ((outcome == 'timeout') - upstream.timeout_rate)
+        upstream.servfail_rate += w * ((outcome == 'servfail') - upstream.servfail_rate)
+        if outcome == 'ok':
+            if latency is not None:
+                upstream.latency = latency if upstream.latency is None else upstream.latency + w * (latency - upstream.latency)
+            upstream.limit = min(self.max_limit, upstream.limit + 1 / upstream.limit)
+        else:
+            # Multiplicative decrease at most once per window: failures of
+            # queries sent before the last decrease belong to the window that
+            # was already cut
+            now = time.monotonic()
+            if sent is None:
+                sent = now - (latency if latency is not None else upstream.timeout)
+            if sent >= upstream.decreased:
+                upstream.limit = max(1.0, upstream.limit / 2)
+                upstream.decreased = now
+
+    def release(self, upstream, outcome, latency=None, sent=None):
+        with self.condition:
+            upstream.inflight -= 1
+            self.record(upstream, outcome, latency, sent)
+            self.condition.notify_all()
+            # Waiters belong to event loops that may run in other threads, so
+            # they are woken through their own loop
+            while self.async_waiters:
+                loop, waiter = self.async_waiters.popleft()
+                if not waiter.done() and not loop.is_closed():
+                    loop.call_soon_threadsafe(self._wake, waiter)
+                    break
+
+    def resolve(self, name, rdtype='A'):
+        # Drop-in for Resolver.resolve(): NXDOMAIN and NoAnswer are definitive,
+        # timeouts and SERVFAIL are retried on another upstream
+        tried = []
+        error = None
+        for _ in range(self.retries + 1):
+            upstream = self.acquire(tried)
+            start = time.monotonic()
+            try:
+                answer = upstream.resolver.resolve(name, rdtype)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.YXDOMAIN):
+                self.release(upstream, 'ok', time.monotonic() - start)
+                raise
+            except dns.exception.Timeout as e:
+                self.release(upstream, 'timeout', sent=start)
+                error = e
+            except Exception as e:
+                self.release(upstream, 'servfail', sent=start)
+                error = e
+            else:
+                self.release(upstream, 'ok', time.monotonic() - start)
+                return answer
+            tried.append(upstream)
+        raise error
+
+    async def resolve_async(self, name, rdtype='A'):
+        tried = []
+        error = None
+        for _ in range(self.retries + 1):
+            upstream = await self.acquire_async(tried)
+            start = time.monotonic()
+            try:
+                answer = await upstream.async_resolver.resolve(name, rdtype)
+            except (dns.resolver.NXDOMAIN, dns.resolver.NoAnswer, dns.resolver.YXDOMAIN):
+                self.release(upstream, 'ok', time.monotonic() - start)
+                raise
+            except dns.exception.Timeout as e:
+                self.release(upstream, 'timeout', sent=start)
+                error = e
+            except Exception as e:
+                self.release(upstream, 'servfail', sent=start)
+                error = e
+            else:
+                self.release(upstream, 'ok', time.monotonic() - start)
+                return answer
+            tried.append(upstream)
+        raise error
+
+    def async_view(self):
+        # Object with an awaitable resolve(), for dns_cache.cached_resolve_async
+        pool = self
+
+        class AsyncPoolResolver:
+            async def resolve(self, name, rdtype='A'):
+                return await pool.resolve_async(name, rdtype)
+
+        return AsyncPoolResolver()
+
+    def summary(self):
+        lines = []
+        for up in sorted(self.upstreams, key=lambda up: up.score()):
+            latency = f"{up.latency * 1000:.1f}ms" if up.latency is not None else '-'
+            lines.append(f"{str(up):<24} queries={up.queries:<8} latency={latency:<8} "
+                         f"timeouts={up.timeout_rate:.1%} servfail={up.servfail_rate:.1%} limit={int(up.limit)}")
+        return lines
+
+class BulkResolver:
+    # massdns-style resolver: queries are pipelined over a few non-blocking UDP
+    # sockets instead of paying for one resolver.resolve() call per name
+    def __init__(self, pool, sockets=4, window=10000, timeout=1.0, retries=3, parse_negative=False):
+        # Nameserver choice, scoring and retry-elsewhere come from the
+        # ResolverPool; the bulk window replaces its per-resolver limits
+        self.pool = pool
+        self.sockets = max(1, sockets)
+        self.window = max(1, window)
+        self.timeout = timeout
+        self.retries = retries
+        # Negative replies are normally decided from the header alone; parsing
+        # them is only worth it when their SOA TTL is needed for caching
+        self.parse_negative = parse_negative
+        # Query template built once with dns.message; only the ID and the
+        # question name are spliced in for each query
+        template = dns.message.make_query('a.', dns.rdatatype.A).to_wire()
+        self.query_header = template[2:12]
+        self.query_tail = template[12 + 3:]
+
+    @staticmethod
+    def encode_name(name):
+        # Fast path for plain hostnames; dns.name.from_text costs more than
+        # everything else on the send path
+        labels = name.rstrip('.').encode('ascii').split(b'.')
+        if not all(0 < len(label) < 64 for label in labels):
+            raise ValueError(f"invalid hostname: {name}")
+        wire = b''.join(bytes((len(label),)) + label for label in labels) + b'\x00'
+        if len(wire) > 255:
+            raise ValueError(f"hostname too long: {name}")
+        return wire
+
+    def build_query(self, query_id, qname_wire):
+        return struct.pack('!H', query_id) + self.query_header + qname_wire + self.query_tail
+
+    @staticmethod
+    def a_records(response, qname):
+        # Same success condition as resolver.resolve(name, 'A'): an A rrset at
+        # the end of the CNAME chain inside the answer section. Returns the
+        # addresses and the smallest TTL along the chain.
+        name = qname
+        ttl = None
+        for _ in range(16):
+            try:
+                rrset = response.find_rrset(response.answer, name, dns.rdataclass.IN, dns.rdatatype.A)
+                ttl = rrset.ttl if ttl is None else min(ttl, rrset.ttl)
+                return frozenset(rdata.address for rdata in rrset), ttl
+            except KeyError:
+                try:
+                    cname = response.find_rrset(response.answer, name, dns.rdataclass.IN, dns.rdatatype.CNAME)
+                except KeyError:
+                    break
+                ttl = cname.ttl if ttl is None else min(ttl, cname.ttl)
+                name = cname[0].target
+        return frozenset(), negative_ttl(response)
+
+    def resolve(self, items, callback):
+        # items is an iterable or a CandidateQueue of tuples whose first element
+        # is the name to resolve. callback(item, status, addresses, ttl) is
+        # called exactly once for every item. status is NOERROR, NODATA,
+        # NXDOMAIN or ERROR; ttl is None when it is unknown.
+        selector = selectors.DefaultSelector()
+        socks = []
+        # family -> indexes into socks
+        families = {}
+        for family in sorted({up.family for up in self.pool.upstreams}):
+            for _ in range(self.sockets):
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+                sock.setblocking(False)
+                try:
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4 * 1024 * 1024)
+                except OSError:
+                    pass
+                selector.register(sock, selectors.EVENT_READ, len(socks))
+                families.setdefault(family, []).append(len(socks))
+                socks.append(sock)
+
+        if isinstance(items, CandidateQueue):
+            source, items = items, None
+        else:
+            source, items = None, iter(items)
+        exhausted = False
+        # (socket index, message id) -> [item, unused, question wire, attempts, deadline, upstream, sent at]
+        pending = {}
+        next_ids = [random.randrange(65536) for _ in socks]
+        # Every query uses the same timeout, so send order is deadline order
+        deadlines = collections.deque()
+        rotation = 0
+
+        def send(entry):
+            nonlocal rotation
+            rotation += 1
+            # Retransmissions go to a different upstream than the last attempt
+            upstream = self.pool.choose(exclude=(entry[5],) if entry[5] else (), weighted=True)
+            group = families[upstream.family]
+            index = group[rotation % len(group)]
+            for _ in range(65536):
+                next_ids[index] = (next_ids[index] + 1) & 0xFFFF
+                if (index, next_ids[index]) not in pending:
+                    break
+            key = (index, next_ids[index])
+            try:
+                socks[index].sendto(self.build_query(key[1], entry[2]), (upstream.address, upstream.port))
+            except (BlockingIOError, InterruptedError):
+                pass  # counted as a lost packet and retransmitted on timeout
+            entry[3] += 1
+            entry[6] = time.monotonic()
+            entry[4] = entry[6] + self.timeout
+            entry[5] = upstream
+            pending[key] = entry
+            deadlines.append((entry[4], key, entry))
+
+        try:
+            while True:
+                while not exhausted and len(pending) < self.window:
+                    if source is not None:
+                        # Never block here: replies still have to be read
+                        item = source.get_nowait()
+                        if item is CandidateQueue.EMPTY:
+                            break
+                        if item is CandidateQueue.DONE:
+                            exhausted = True
+                            break
+                    else:
+                        try:
+                            item = next(items)
+                        except StopIteration:
+                            exhausted = True
+                            break
+                    try:
+                        send([item, None, self.encode_name(item[0]), 0, 0.0, None, 0.0])
+                    except (UnicodeError, ValueError):
+                        callback(item, 'ERROR', frozenset(), None)
+                if exhausted and not pending:
+                    break
+
+                wait = 0.05 if pending or exhausted else 0.005
+                if deadlines:
+                    wait = min(wait, max(0.0, deadlines[0][0] - time.monotonic()))
+                for selector_key, _ in selector.select(wait):
+                    index = selector_key.data
+                    sock = selector_key.fileobj
+                    while True:
+                        try:
+                            wire = sock.recv(65535)
+                        except (BlockingIOError, InterruptedError):
+                            break
+                        except OSError:
+                            continue  # ICMP errors surface here on some platforms
+                        if len(wire) < 12:
+                            continue
+                        query_id, flags = struct.unpack('!HH', wire[:4])
+                        entry = pending.get((index, query_id))
+                        if entry is None:
+                            continue
+                        question = entry[2]
+                        # Replies are matched by ID and by the echoed question name
+                        if wire[12:12 + len(question)].lower() != question.lower():
+                            continue
+                        rcode = flags & 0x000F
+                        del pending[(index, query_id)]
+                        if rcode == dns.rcode.SERVFAIL or rcode == dns.rcode.REFUSED:
+                            self.pool.record(entry[5], 'servfail', sent=entry[6])
+                            if entry[3] <= self.retries:
+                                send(entry)
+                            else:
+                                callback(entry[0], 'ERROR', frozenset(), None)
+                            continue
+                        self.pool.record(entry[5], 'ok', time.monotonic() - entry[6])
+                        if rcode not in (dns.rcode.NOERROR, dns.rcode.NXDOMAIN):
+                            callback(entry[0], 'ERROR', frozenset(), None)
+                            continue
+                        status = 'NXDOMAIN' if rcode == dns.rcode.NXDOMAIN else 'NODATA'
+                        addresses, ttl = frozenset(), None
+                        if (rcode == dns.rcode.NOERROR and struct.unpack('!H', wire[6:8])[0]) or self.parse_negative:
+                            try:
+                                response = dns.message.from_wire(wire)
+                                if rcode == dns.rcode.NOERROR:
+                                    addresses, ttl = self.a_records(response, response.question[0].name)
+                                else:
+                                    ttl = negative_ttl(response)
+                            except dns.exception.DNSException:
+                                status = 'ERROR'
+                        if addresses:
+                            status = 'NOERROR'
+                        callback(entry[0], status, addresses, ttl)
+
+                now = time.monotonic()
+                while deadlines and deadlines[0][0] <= now:
+                    _, key, entry = deadlines.popleft()
+                    if pending.get(key) is not entry or entry[4] > now:
+                        continue  # already answered or retransmitted since
+                    del pending[key]
+                    self.pool.record(entry[5], 'timeout', sent=entry[6])
+                    if entry[3] <= self.retries:
+                        send(entry)
+                    else:
+                        callback(entry[0], 'ERROR', frozenset(), None)
+        finally:
+            selector.close()
+            for sock in socks:
+                sock.close()
+
+class ResponseTooLarge(Exception):
+    pass
+
+class HTTPClient:
+    # Shared client for the passive sources: one keep-alive session with a
+    # connection pool per host, bounded retries with jittered exponential
+    # backoff (honouring Retry-After) and a cap on response size
+    RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+    def __init__(self, timeout=5, retries=3, backoff=0.5, max_backoff=30, max_bytes=64 * 1024 * 1024, pool_size=16):
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_bytes = max_bytes
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    def retry_delay(self, attempt, response=None):
+        # Full jitter, but never sooner than the server asked for
+        delay = random.uniform(0, min(self.max_backoff, self.backoff * (2 ** attempt)))
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                wait = float(retry_after)
+            except ValueError:
+                try:
+                    wait = parsedate_to_datetime(retry_after).timestamp() - time.time()
+                except (TypeError, ValueError):
+                    wait = 0
+            delay = max(delay, min(wait, self.max_backoff * 2))
+        return delay
+
+    def read_limited(self, response):
+        length = response.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > self.max_bytes:
+            response.close()
+            raise ResponseTooLarge(f"{response.url} is {length} bytes (limit {self.max_bytes})")
+        chunks = []
+        size = 0
+        for chunk in response.iter_content(64 * 1024):
+            size += len(chunk)
+            if size > self.max_bytes:
+                response.close()
+                raise ResponseTooLarge(f"{response.url} exceeded {self.max_bytes} bytes")
+            chunks.append(chunk)
+        response._content = b''.join(chunks)
+        return response
+
+    def get(self, url, stream=False, **kwargs):
+        # With stream=True the body is left unread for the caller to consume
+        kwargs.setdefault('timeout', self.timeout)
+        for attempt in range(self.retries + 1):
+            response = None
+            try:
+                response = self.session.get(url, stream=True, **kwargs)
+                if response.status_code in self.RETRY_STATUSES and attempt < self.retries:
+                    response.close()
+                    time.sleep(self.retry_delay(attempt, response))
+                    continue
+                return response if stream else self.read_limited(response)
+            except (requests.ConnectionError, requests.Timeout, requests.exceptions.ChunkedEncodingError):
+                if attempt >= self.retries:
+                    raise
+                time.sleep(self.retry_delay(attempt))
+
+    def close(self):
+        self.session.close()
+
+class DiscoveryPipeline:
+    # Streaming discovery: sources -> normalise/dedupe -> resolve/validate ->
+    # sink. Every stage runs concurrently in its own thread(s) and the stages
+    # are linked by bounded CandidateQueues, so total wall-clock time tracks
+    # the slowest stage instead of the sum of all of them.
+    #
+    # Items are (name, source, finder) tuples; the finder owns normalisation,
+    # dedupe and result handling for its domain.
+    def __init__(self, pool, cache=None, engine='threads', threads=10, concurrency=1000, sockets=4, timeout=1.0,
+                 queue_size=10000, processes=1, metrics=None):
+        self.pool = pool
+        self.metrics = metrics
+        self.cache = cache
+        self.engine = engine
+        self.processes = processes
+        self.threads = threads
+        self.concurrency = concurrency
+        self.sockets = sockets
+        self.timeout = timeout
+        self.normalize_queue = CandidateQueue(queue_size)
+        self.resolve_queue = CandidateQueue(queue_size)
+        self.sink_queue = CandidateQueue(queue_size)
+        self.lock = threading.Lock()
+        # Items submitted but not through the sink yet, and running sources;
+        # the input queues are closed once both drop to zero
+        self.outstanding = 0
+        self.active_sources = 0
+        # Sources may all finish before run() is called; the queues are only
+        # closed once the pipeline is running
+        self.running = False
+        self.closed = False
+        self.threads_started = []
+
+    @classmethod
+    def for_finder(cls, finder, **kwargs):
+        return cls(finder.pool, finder.cache, engine=finder.engine, threads=finder.threads,
+                   concurrency=finder.concurrency, sockets=finder.sockets, timeout=finder.resolver.timeout,
+                   processes=finder.processes, metrics=finder.metrics, **kwargs)
+
+    def add_source(self, target, *args):
+        # Sources may be added while the pipeline runs (e.g. from the sink)
+        with self.lock:
+            self.active_sources += 1
+
+        def run_source():
+            try:
+                target(*args)
+            except Exception as e:
+                print(f"[-] Error in discovery source {getattr(target, '__name__', target)}: {e}")
+            finally:
+                with self.lock:
+                    self.active_sources -= 1
+                    self._maybe_close()
+
+        thread = threading.Thread(target=run_source, daemon=True)
+        thread.start()
+        return thread
+
+    def submit(self, name, source, finder):
+        with self.lock:
+            self.outstanding += 1
+        self.normalize_queue.put((name, source, finder))
+
+    def _maybe_close(self):
+        if self.running and not self.closed and self.active_sources == 0 and self.outstanding == 0:
+            self.closed = True
+            self.normalize_queue.close()
+            self.resolve_queue.close()
+
+    def finish(self, item, count=1):
+        item[2].candidate_done(item[0], item[1])
+        with self.lock:
+            self.outstanding -= count
+            self._maybe_close()
+
+    def normalize_stage(self):
+        for raw_name, source, finder in self.normalize_queue:
+            accepted = []
+            for name, candidate_source in finder.expand_candidate(raw_name, source):
+                if finder.accept_candidate(name, candidate_source):
+                    accepted.append((name, candidate_source, finder))
+                elif self.metrics is not None:
+                    self.metrics.inc('candidates_duplicate_total', source=candidate_source)
+            if not accepted:
+                self.finish((raw_name, source, finder))
+                continue
+            if not any(item[1] == source for item in accepted):
+                # The raw name itself was rejected but some of its parents
+                # were not: the raw item is done now, and the parents (as
+                # 'derived') are accounted for when they leave the sink
+                finder.candidate_done(raw_name, source)
+            with self.lock:
+                self.outstanding += len(accepted) - 1
+            for item in accepted:
+                hit = self.cache.get(item[0], 'A', with_ttl=True) if self.cache is not None else None
+                if self.metrics is not None:
+                    self.metrics.inc('candidates_total', source=item[1])
+                if hit is not None:
+                    # Live cache entries skip the resolver stage entirely
+                    if self.metrics is not None:
+                        self.metrics.inc('dns_cache_hits_total')
+                    self.sink_queue.put(item + (hit[0], frozenset(hit[1]), hit[2]))
+                else:
+                    self.resolve_queue.put(item)
+
+    def deliver(self, item, status, addresses, ttl=None):
+        if self.metrics is not None:
+            self.metrics.inc('dns_results_total', status=status)
+        self.sink_queue.put(item + (status, addresses, ttl))
+
+    def resolve_stage(self):
+        try:
+            if self.processes > 1:
+                self.resolve_processes()
+            elif self.engine == 'async':
+                asyncio.run(self.resolve_async())
+            elif self.engine == 'bulk':
+                self.resolve_bulk()
+            else:
+                self.resolve_threads()
+        finally:
+            self.sink_queue.close()
+
+    def resolve_threads(self):
+        def worker():
+            for item in self.resolve_queue:
+                self.deliver(item, *item[2].resolve_name(item[0]))
+
+        workers = [threading.Thread(target=worker, daemon=True) for _ in range(max(1, self.threads))]
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+
+    async def resolve_async(self):
+        loop = asyncio.get_running_loop()
+        resolver = self.pool.async_view()
+        # A fixed set of workers keeps at most `concurrency` queries in flight
+        # without creating a task per name; a feeder moves batches from the
+        # thread-side queue onto the event loop and a drainer moves results
+        # back, so a full sink queue never blocks the loop itself
+        pending = asyncio.Queue(maxsize=max(1, self.concurrency))
+        resolved = asyncio.Queue(maxsize=max(1, self.concurrency))
+        workers_count = max(1, self.concurrency)
+
+        def deliver_batch(batch):
+            for result in batch:
+                self.deliver(*result)
+
+        async def feeder():
+            while True:
+                batch = await loop.run_in_executor(None, self.resolve_queue.get_batch, 256)
+                if not batch:
+                    break
+                for item in batch:
+                    await pending.put(item)
+            for _ in range(workers_count):
+                await pending.put(None)
+
+        async def worker():
+            while True:
+                item = await pending.get()
+                if item is None:
+                    return
+                await resolved.put((item, *await item[2].async_resolve_name(resolver, item[0])))
+
+        async def drainer():
+            finished = False
+            while not finished:
+                batch = [await resolved.get()]
+                while len(batch) < 256 and not resolved.empty():
+                    batch.append(resolved.get_nowait())
+                if batch[-1] is None:
+                    batch.pop()
+                    finished = True
+                if batch:
+                    await loop.run_in_executor(None, deliver_batch, batch)
+
+        drain = asyncio.ensure_future(drainer())
+        try:
+            await asyncio.gather(feeder(), *(worker() for _ in range(workers_count)))
+        finally:
+            await resolved.put(None)
+            await drain
+
+    def resolve_bulk(self):
+        bulk = BulkResolver(
+            self.pool,
+            sockets=self.sockets,
+            window=self.concurrency,
+            timeout=self.timeout,
+            parse_negative=self.cache is not None
+        )
+
+        def on_result(item, status, addresses, ttl):
+            if self.cache is not None and status != 'ERROR':
+                self.cache.put(item[0], 'A', status, sorted(addresses), ttl)
+            self.deliver(item, status, addresses, ttl)
+
+        bulk.resolve(self.resolve_queue, on_result)
+
+    def resolve_processes(self, batch_size=256):
+        # Sharded resolve stage: candidates are sent round-robin, in batches,
+        # to worker processes that each run their own bulk resolution loop
+        # (see resolve_shard), so message building and parsing is spread over
+        # several cores. Results come back in batches on one shared queue.
+        context = multiprocessing.get_context('spawn')
+        results = context.Queue()
+        inboxes = []
+        workers = []
+        window = max(1, self.concurrency // self.processes)
+        for index in range(self.processes):
+            inbox = context.Queue(maxsize=max(2, window // batch_size + 1))
+            worker = context.Process(
+                target=resolve_shard,
+                args=(index, self.pool.addresses(), self.timeout, self.pool.retries, self.sockets, window,
+                      self.cache is not None, inbox, results, batch_size),
+                daemon=True
+            )
+            worker.start()
+            inboxes.append(inbox)
+            workers.append(worker)
+        # name -> [(item, worker index)] for candidates sent but not answered
+        pending = {}
+        lock = threading.Lock()
+
+        def fail(index):
+            with lock:
+                lost = [(name, entry) for name, entries in pending.items() for entry in entries if entry[1] == index]
+                for name, entry in lost:
+                    pending[name].remove(entry)
+                    if not pending[name]:
+                        del pending[name]
+            for name, (item, _) in lost:
+                self.deliver(item, 'ERROR', frozenset())
+
+        def send(index, names):
+            while True:
+                try:
+                    inboxes[index].put(names, timeout=1)
+                    return True
+                except queue.Full:
+                    if not workers[index].is_alive():
+                        return False
+
+        def feeder():
+            index = 0
+            while True:
+                batch = self.resolve_queue.get_batch(batch_size)
+                if not batch:
+                    break
+                with lock:
+                    for item in batch:
+                        pending.setdefault(item[0], []).append((item, index))
+                if not send(index, [item[0] for item in batch]):
+                    fail(index)
+                index = (index + 1) % self.processes
+            for index in range(self.processes):
+                send(index, None)
+
+        feeder_thread = threading.Thread(target=feeder, daemon=True)
+        feeder_thread.start()
+        running = set(range(self.processes))
+        while running:
+            try:
+                index, batch = results.get(timeout=1)
+            except queue.Empty:
+                for index in list(running):
+                    if not workers[index].is_alive():
+                        print(f"[-] Resolver process {index} exited with code {workers[index].exitcode}")
+                        running.discard(index)
+                        fail(index)
+                continue
+            if batch is None:
+                running.discard(index)
+                continue
+            for name, status, addresses, ttl in batch:
+                with lock:
+                    entries = pending.pop(name, [])
+                addresses = frozenset(addresses)
+                if entries and self.cache is not None and status != 'ERROR':
+                    self.cache.put(name, 'A', status, sorted(addresses), ttl)
+                for item, _ in entries:
+                    self.deliver(item, status, addresses, ttl)
+        feeder_thread.join()
+        for worker in workers:
+            worker.join()
+
+    def sink_stage(self):
+        for name, source, finder, status, addresses, ttl in self.sink_queue:
+            try:
+                finder.handle_result(name, source, status, addresses, ttl)
+            except Exception as e:
+                print(f"[-] Error handling result for {name}: {e}")
+            self.finish((name, source, finder))
+
+    def run(self):
+        # Blocks until every source is exhausted and every candidate has
+        # passed through the sink
+        if self.metrics is not None:
+            for name, candidates in (('normalize', self.normalize_queue), ('resolve', self.resolve_queue),
+                                     ('sink', self.sink_queue)):
+                self.metrics.gauge('queue_depth', candidates.qsize, queue=name)
+            self.metrics.gauge('candidates_outstanding', lambda: self.outstanding)
+            self.metrics.gauge('sources_active', lambda: self.active_sources)
+        stages = [self.normalize_stage, self.resolve_stage, self.sink_stage]
+        self.threads_started = [threading.Thread(target=stage, daemon=True) for stage in stages]
+        for thread in self.threads_started:
+            thread.start()
+        with self.lock:
+            self.running = True
+            self._maybe_close()
+        # join() with a timeout keeps the main thread responsive to Ctrl-C
+        for thread in self.threads_started:
+            while thread.is_alive():
+                thread.join(0.5)
+
+def resolve_shard(index, nameservers, timeout, retries, sockets, window, parse_negative, inbox, results, batch_size=256):
+    # Worker process of DiscoveryPipeline.resolve_processes: resolves the
+    # batches of names read from inbox with its own pool and BulkResolver and
+    # puts (index, [(name, status, addresses, ttl), ...]) batches on results,
+    # ending with (index, None)
+    try:
+        pool = ResolverPool(nameservers, timeout=timeout, retries=retries)
+        bulk = BulkResolver(pool, sockets=sockets, window=window, timeout=timeout, retries=retries,
+                            parse_negative=parse_negative)
+        names = CandidateQueue(window * 2)
+        buffer = []
+        lock = threading.Lock()
+        finished = threading.Event()
+
+        def reader():
+            while True:
+                batch = inbox.get()
+                if batch is None:
+                    break
+                for name in batch:
+                    names.put((name,))
+            names.close()
+
+        def flush():
+            with lock:
+                batch = buffer[:]
+                buffer.clear()
+            if batch:
+                results.put((index, batch))
+
+        def flusher():
+            # Partial batches are sent after a short delay so a slow trickle
+            # of answers is not held back
+            while not finished.wait(0.05):
+                flush()
+
+        def on_result(item, status, addresses, ttl):
+            with lock:
+                buffer.append((item[0], status, tuple(addresses), ttl))
+                full = len(buffer) >= batch_size
+            if full:
+                flush()
+
+        threading.Thread(target=reader, daemon=True).start()
+        flusher_thread = threading.Thread(target=flusher, daemon=True)
+        flusher_thread.start()
+        bulk.resolve(names, on_result)
+        finished.set()
+        flusher_thread.join()
+        flush()
+        results.put((index, None))
+    except KeyboardInterrupt:
+        pass
+
+def iter_json_array(chunks):
+    # Incrementally yields the elements of a top-level JSON array from an
+    # iterable of byte chunks, holding at most one partial element in memory
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')('replace')
+    buffer = ''
+    position = 0
+    started = False
+    chunks = iter(chunks)
+    exhausted = False
+    while True:
+        # Skip whitespace and separators between elements
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer):
+            if not started:
+                if buffer[position] != '[':
+                    raise ValueError('expected a JSON array')
+                started = True
+                position += 1
+                continue
+            if buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if exhausted:
+                    raise
+            else:
+                # A value ending at the buffer end may be a number that continues
+                # in the next chunk. raw_decode also stops a number early at a
+                # trailing '.', 'e' or sign ('1.' of '1.5'), so a number is only
+                # complete once something other than number characters follows
+                tail = end
+                if isinstance(item, (int, float)):
+                    while tail < len(buffer) and buffer[tail] in '0123456789.eE+-':
+                        tail += 1
+                if tail < len(buffer) or exhausted:
+                    yield item
+                    position = end
+                    continue
+        elif exhausted:
+            if started:
+                raise ValueError('truncated JSON array')
+            return
+        # Need more data: drop what has been consumed and read the next chunk
+        buffer = buffer[position:]
+        position = 0
+        try:
+            buffer += utf8.decode(next(chunks))
+        except StopIteration:
+            buffer += utf8.decode(b'', final=True)
+            exhausted = True
 
 class SubdomainFinder:
-    def __init__(self, domain, wordlist=None, output=None, threads=10, timeout=5):
+    # Candidates we made up ourselves, as opposed to names a passive source
+    # has seen; only these are subject to wildcard filtering
+    GENERATED_SOURCES = {'bruteforce', 'derived', 'permutation', 'recursive'}
+    # Default words mixed into discovered names by the permutation stage;
+    # labels of discovered names are added to these as the run goes on
+    PERMUTATION_WORDS = [
+        'dev', 'development', 'stage', 'staging', 'test', 'testing', 'qa', 'uat', 'prod', 'production',
+        'api', 'admin', 'internal', 'int', 'ext', 'beta', 'demo', 'old', 'new', 'backup', 'v1', 'v2',
+        'app', 'web', 'mail', 'vpn', 'portal', 'cdn', 'static', 'db', 'proxy', 'origin', 'mobile', 'm'
+    ]
+    MAX_PERMUTATION_WORDS = 1000
+    # Passive searches, by method name as recorded in checkpoints
+    PASSIVE_SOURCES = ('crt_sh_search', 'search_virustotal', 'search_alienvault', 'search_hackertarget')
+    # NXDOMAIN names remembered for subtree pruning
+    MAX_NXDOMAIN_NAMES = 100000
+    # Base URLs of the passive sources; can be overridden, e.g. to point at
+    # local stand-ins for benchmarking
+    SOURCE_URLS = {
+        'crt.sh': 'https://crt.sh',
+        'virustotal': 'https://www.virustotal.com',
+        'alienvault': 'https://otx.alienvault.com',
+        'hackertarget': 'https://api.hackertarget.com'
+    }
+
+    def __init__(self, domain, wordlist=None, output=None, threads=10, timeout=5, engine='threads', concurrency=1000, sockets=4,
+                 checkpoint=None, checkpoint_interval=30, resume=False, cache=DEFAULT_CACHE_PATH, resolvers=None,
+                 http=None, keep_unresolved=False, permutations=False, permutation_words=None, depth=1, seen=None,
+                 processes=1, metrics=None, source_urls=None, jsonl=None):
         self.domain = domain
         self.wordlist_file = wordlist
         self.output_file = output if output else f"{domain}_subdomains_{datetime.now().strftime('%Y%m%d_%H%M%S')}.txt"
         self.threads = threads
         self.timeout = timeout
+        self.engine = engine
+        self.concurrency = concurrency
+        self.sockets = sockets
+        self.processes = max(1, processes)
+        self.metrics = metrics
         self.subdomains = set()
+        # Built once per domain instead of once per crt.sh entry
+        self.name_pattern = re.compile(r'([a-zA-Z0-9._-]+\.' + re.escape(domain) + ')', re.IGNORECASE)
+        # zone -> frozenset of A records returned for random labels (empty when
+        # the zone has no wildcard)
+        self.wildcards = {}
+        # zone -> Future of a detection in progress or done; only guarded by
+        # the lock while it is looked up, never during the probe queries
+        self.wildcard_probes = {}
+        self.wildcard_lock = threading.Lock()
+        self.wildcard_filtered = 0
+        self.keep_unresolved = keep_unresolved
+        self.unresolved_passive = 0
+        self.pipeline = None
+        self.state_lock = threading.Lock()
+        self.passive_running = 0
+        self.passive_pending = 0
+        self.passive_succeeded = set()
+        self.permutations = permutations
+        self.permutation_words = list(self.PERMUTATION_WORDS)
+        if permutation_words:
+            try:
+                with open(permutation_words, 'r', encoding='utf-8', errors='ignore') as f:
+                    self.permutation_words = [line.strip().lower() for line in f if line.strip()]
+            except Exception as e:
+                print(f"[-] Error loading permutation words: {e}")
+        self.known_permutation_words = set(self.permutation_words)
+        # Names found so far that still have to be permuted
+        self.permutation_seeds = collections.deque()
+        self.permutation_running = False
+        # Recursive brute force: names to brute-force under, and an LRU of
+        # NXDOMAIN names whose subtrees are skipped (RFC 8020)
+        self.depth = max(1, depth)
+        self.recursion_seeds = collections.deque()
+        self.recursion_running = False
+        self.nxdomains = collections.OrderedDict()
+        self.pruned = 0
+        self.checkpoint = Checkpoint(checkpoint or f"{domain}_checkpoint.json", checkpoint_interval)
+        self.resume = resume
+        if resume:
+            state = self.checkpoint.load()
+            if state and state.get('wordlist') != wordlist:
+                print(f"[-] Checkpoint was taken with wordlist {state.get('wordlist')}, restarting the wordlist from the beginning")
+                self.checkpoint.read_position = 0
+            if self.checkpoint.passive_done is True:
+                self.checkpoint.passive_done = set(self.PASSIVE_SOURCES)
+            if state:
+                if not output and state.get('output'):
+                    self.output_file = state['output']
+                if not jsonl and state.get('jsonl'):
+                    jsonl = state['jsonl']
+                self.subdomains.update(state.get('subdomains', []))
+        # Every result is appended to the JSONL file as it is found; the text
+        # output is produced from it at the end. jsonl=False disables it.
+        if jsonl is False:
+            self.results = None
+        else:
+            self.results = ResultSink(jsonl or f"{os.path.splitext(self.output_file)[0]}.jsonl", append=resume)
+            if self.subdomains and not os.path.getsize(self.results.path):
+                # Checkpoint from before the JSONL file existed
+                for name in sorted(self.subdomains):
+                    self.results.write(name, 'checkpoint', status=None)
         self.resolver = dns.resolver.Resolver()
         self.resolver.timeout = 1
         self.resolver.lifetime = 1
+        # All engines query through the pool; by default it wraps the system
+        # resolver's nameservers
+        if isinstance(resolvers, ResolverPool):
+            self.pool = resolvers
+        else:
+            self.pool = ResolverPool(resolvers or self.resolver.nameservers, port=self.resolver.port, timeout=self.resolver.timeout)
+        # Each upstream starts with its share of the engine's in-flight queries
+        self.pool.share_limit(threads if engine == 'threads' else concurrency)
+        if metrics is not None:
+            self.pool.metrics = metrics
+        self.http = http or HTTPClient(timeout=timeout)
+        self.source_urls = dict(self.SOURCE_URLS, **(source_urls or {}))
+        self.max_pages = 50
+        # Answers are shared across runs through an on-disk TTL cache; batch
+        # scans pass one open DNSCache to every finder
+        self.cache = cache if isinstance(cache, DNSCache) else (DNSCache(cache) if cache else None)
+        # Dedupe of passive, derived, permuted and recursive names; wordlist
+        # entries are deduplicated by word when the wordlist is read. The
+        # filter grows with the number of names (permutations can produce
+        # far more than any fixed size) so its false-positive rate stays bounded
+        if seen is None:
+            seen = ScalableBloomFilter(100000, name='candidate dedupe filter')
+        self.seen = seen
+        self.wordlist_duplicates = 0
         self.user_agents = [
             'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36',
             'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.107 Safari/537.36',
@@ -33,198 +1619,829 @@ class SubdomainFinder:
         return random.choice(self.user_agents)
         
     def load_wordlist(self):
+        # Default small wordlist for common subdomains; wordlist files are
+        # streamed by iter_wordlist_entries
+        return [
+            'www', 'mail', 'ftp', 'localhost', 'webmail', 'smtp', 'pop', 'ns1', 'webdisk',
+            'ns2', 'cpanel', 'whm', 'autodiscover', 'autoconfig', 'admin', 'test', 'mx', 
+            'portal', 'blog', 'dev', 'api', 'cloud', 'vpn', 'secure', 'server', 'mobile',
+            'docs', 'shop', 'forum', 'login', 'app', 'cdn', 'stage', 'beta', 'pay', 'owa',
+            'dashboard', 'images', 'support', 'git', 'gitlab', 'jenkins', 'intranet',
+            'media', 'store', 'web', 'panel', 'wiki', 'help', 'moodle', 'status', 'crm',
+            'student', 'alumni', 'library', 'elearning', 'e-learning', 'sso', 'research',
+            'mail2', 'remote', 'db', 'database', 'apps', 'calendar', 'chat', 'citrix',
+            'connect', 'data', 'demo', 'directory', 'dl', 'dns', 'host', 'hr', 'jobs',
+            'learn', 'lms', 'local', 'm', 'manage', 'mgmt', 'monitor', 'new', 'news',
+            'old', 'online', 'partners', 'pma', 'prod', 'project', 'proxy', 'ra',
+            'remove', 'reports', 'sandbox', 'search', 'services', 'share', 'staff',
+            'study', 'training', 'uat', 'upload', 'video', 'videos', 'workspace', 'www2'
+        ]
+
+    def iter_wordlist_entries(self, start=0, dedupe=True):
+        # Streams the wordlist instead of materialising it, so the first query
+        # goes out as soon as the first line is read. Yields (start offset, end
+        # offset, word) so runs can be resumed. With dedupe, repeated words are
+        # dropped by word, independent of the domain, through a filter that
+        # grows with the list and stops filtering (with a warning) rather than
+        # exceed its false-positive rate. Words before a resume position are
+        # not in the filter, so their repeats later on are queried again.
         if not self.wordlist_file:
-            # Default small wordlist for common subdomains
-            return [
-                'www', 'mail', 'ftp', 'localhost', 'webmail', 'smtp', 'pop', 'ns1', 'webdisk',
-                'ns2', 'cpanel', 'whm', 'autodiscover', 'autoconfig', 'admin', 'test', 'mx', 
-                'portal', 'blog', 'dev', 'api', 'cloud', 'vpn', 'secure', 'server', 'mobile',
-                'docs', 'shop', 'forum', 'login', 'app', 'cdn', 'stage', 'beta', 'pay', 'owa',
-                'dashboard', 'images', 'support', 'git', 'gitlab', 'jenkins', 'intranet',
-                'media', 'store', 'web', 'panel', 'wiki', 'help', 'moodle', 'status', 'crm',
-                'student', 'alumni', 'library', 'elearning', 'e-learning', 'sso', 'research',
-                'mail2', 'remote', 'db', 'database', 'apps', 'calendar', 'chat', 'citrix',
-                'connect', 'data', 'demo', 'directory', 'dl', 'dns', 'host', 'hr', 'jobs',
-                'learn', 'lms', 'local', 'm', 'manage', 'mgmt', 'monitor', 'new', 'news',
-                'old', 'online', 'partners', 'pma', 'prod', 'project', 'proxy', 'ra',
-                'remove', 'reports', 'sandbox', 'search', 'services', 'share', 'staff',
-                'study', 'training', 'uat', 'upload', 'video', 'videos', 'workspace', 'www2'
-            ]
-        else:
-            try:
-                with open(self.wordlist_file, 'r') as f:
-                    return [line.strip() for line in f if line.strip()]
-            except Exception as e:
-                print(f"Error loading wordlist: {e}")
-                return []
-                
+            for index, word in enumerate(self.load_wordlist()[start:], start):
+                yield index, index + 1, word
+            return
+        try:
+            f = open(self.wordlist_file, 'rb', buffering=1024 * 1024)
+        except Exception as e:
+            print(f"Error loading wordlist: {e}")
+            return
+        words = None
+        if dedupe:
+            size = os.path.getsize(self.wordlist_file) - start
+            words = ScalableBloomFilter(max(10000, size // 8), name='wordlist dedupe filter')
+        duplicates = 0
+        with f:
+            f.seek(start)
+            offset = start
+            for raw in f:
+                line_start = offset
+                offset += len(raw)
+                word = raw.strip().decode('utf-8', 'ignore').lower()
+                if not word:
+                    continue
+                if words is not None and words.add(word):
+                    duplicates += 1
+                    continue
+                yield line_start, offset, word
+        if duplicates:
+            self.wordlist_duplicates += duplicates
+            print(f"[*] Skipped {duplicates} duplicate wordlist entries")
+
+    def iter_wordlist(self, start=0):
+        # Recursive passes: their names go through the per-domain dedupe
+        for _, _, word in self.iter_wordlist_entries(start, dedupe=False):
+            yield word
+
+    def detect_wildcard(self, zone, probes=3):
+        # The first caller for a zone probes it; concurrent callers for the
+        # same zone wait for that result, callers for other zones are not held up
+        with self.wildcard_lock:
+            probe = self.wildcard_probes.get(zone)
+            owner = probe is None
+            if owner:
+                probe = self.wildcard_probes[zone] = concurrent.futures.Future()
+        if not owner:
+            return probe.result()
+        addresses = set()
+        try:
+            for _ in range(probes):
+                label = ''.join(random.choices(string.ascii_lowercase + string.digits, k=16))
+                try:
+                    answer = self.pool.resolve(f"{label}.{zone}", 'A')
+                    addresses.update(rdata.address for rdata in answer)
+                except Exception:
+                    pass
+        finally:
+            fingerprint = self.wildcards[zone] = frozenset(addresses)
+            probe.set_result(fingerprint)
+        if addresses:
+            print(f"[!] Wildcard DNS detected for *.{zone}: {', '.join(sorted(addresses))}")
+        return fingerprint
+
+    def is_wildcard(self, full_domain, addresses):
+        zone = full_domain.split('.', 1)[1] if '.' in full_domain else full_domain
+        fingerprint = self.wildcards.get(zone)
+        if fingerprint is None:
+            fingerprint = self.detect_wildcard(zone)
+        return bool(fingerprint) and addresses <= fingerprint
+
+    def record_result(self, name, source, addresses=(), ttl=None, status='NOERROR'):
+        self.subdomains.add(name)
+        if self.results is not None:
+            self.results.write(name, source, addresses, ttl, status)
+
+    def add_resolved_subdomain(self, full_domain, addresses, source='bruteforce', ttl=None):
+        # Hits that only return the zone's wildcard answers are dropped before
+        # they are counted, printed or written out
+        if self.is_wildcard(full_domain, addresses):
+            self.wildcard_filtered += 1
+            return None
+        self.record_result(full_domain, source, addresses, ttl)
+        print(f"[+] Discovered subdomain: {full_domain}")
+        return full_domain
+
+    def resolve_name(self, full_domain):
+        # (status, addresses, ttl), consulting the persistent cache first
+        try:
+            status, addresses, ttl = cached_resolve(self.pool, self.cache, full_domain, 'A', with_ttl=True)
+        except Exception:
+            return 'ERROR', frozenset(), None
+        return status, frozenset(addresses), ttl
+
+    async def async_resolve_name(self, resolver, full_domain):
+        try:
+            status, addresses, ttl = await cached_resolve_async(resolver, self.cache, full_domain, 'A', with_ttl=True)
+        except Exception:
+            return 'ERROR', frozenset(), None
+        return status, frozenset(addresses), ttl
+
     def dns_brute_force(self, subdomain):
         full_domain = f"{subdomain}.{self.domain}"
-        try:
-            self.resolver.resolve(full_domain, 'A')
-            self.subdomains.add(full_domain)
-            print(f"[+] Discovered subdomain: {full_domain}")
-            return full_domain
-        except:
+        status, addresses, ttl = self.resolve_name(full_domain)
+        if not addresses:
             return None
-    
+        return self.add_resolved_subdomain(full_domain, addresses, ttl=ttl)
+
+    def normalize_name(self, name):
+        # Lower-case, drop wildcard/leading dots and keep only names inside the domain
+        name = name.strip().lower().rstrip('.').lstrip('*.')
+        if name.endswith('.' + self.domain) and ' ' not in name:
+            return name
+        return None
+
+    def expand_candidate(self, raw_name, source):
+        # Normalise stage: yields (name, source) pairs to resolve. Names from
+        # passive sources also yield their intermediate parents, which guides
+        # brute force towards branches the sources only hinted at.
+        name = self.normalize_name(raw_name)
+        if name is None:
+            return
+        if source not in self.GENERATED_SOURCES:
+            yield name, source
+            parent = name.split('.', 1)[1]
+            while parent != self.domain and parent.endswith('.' + self.domain):
+                if not self.under_nxdomain(parent):
+                    yield parent, 'derived'
+                parent = parent.split('.', 1)[1]
+        elif not self.under_nxdomain(name):
+            yield name, source
+
+    def level(self, name):
+        # Number of labels below the target domain
+        return name[:-len(self.domain) - 1].count('.') + 1
+
+    def record_nxdomain(self, name):
+        with self.state_lock:
+            self.nxdomains[name] = True
+            self.nxdomains.move_to_end(name)
+            if len(self.nxdomains) > self.MAX_NXDOMAIN_NAMES:
+                self.nxdomains.popitem(last=False)
+
+    def under_nxdomain(self, name):
+        # RFC 8020: nothing exists below an NXDOMAIN name, so generated
+        # candidates under one are dropped without a query
+        if not self.nxdomains:
+            return False
+        parent = name.split('.', 1)[1]
+        with self.state_lock:
+            while parent != self.domain and parent.endswith('.' + self.domain):
+                if parent in self.nxdomains:
+                    self.nxdomains.move_to_end(parent)
+                    self.pruned += 1
+                    return True
+                parent = parent.split('.', 1)[1]
+        return False
+
+    def accept_candidate(self, name, source=None):
+        # Dedupe across sources; names restored from a checkpoint are skipped.
+        # Wordlist names are already unique, so they are only checked against
+        # names other sources queued and are not added to the filter.
+        if name in self.subdomains:
+            return False
+        if source == 'bruteforce':
+            return name not in self.seen
+        return not self.seen.add(name)
+
+    def emit(self, name, source):
+        # Passive sources and the wordlist feed candidates through here
+        if source not in self.GENERATED_SOURCES:
+            with self.state_lock:
+                self.passive_pending += 1
+            if self.metrics is not None:
+                self.metrics.inc('source_records_total', source=source)
+        if self.pipeline is not None:
+            self.pipeline.submit(name, source, self)
+            return
+        # Without a pipeline (e.g. calling a source method directly) names are
+        # recorded unvalidated, as before
+        name = self.normalize_name(name)
+        if name and name not in self.subdomains:
+            self.record_result(name, source, status=None)
+            print(f"[+] Discovered from {source}: {name}")
+
+    def handle_result(self, name, source, status, addresses, ttl=None):
+        # Sink stage
+        found = None
+        if source in self.GENERATED_SOURCES:
+            if addresses:
+                found = self.add_resolved_subdomain(name, addresses, source, ttl)
+        elif addresses or self.keep_unresolved:
+            # A passive source vouches for the name, so wildcard answers are kept
+            if name not in self.subdomains:
+                self.record_result(name, source, addresses, ttl, status)
+                suffix = '' if addresses else f" (unresolved: {status})"
+                print(f"[+] Discovered from {source}: {name}{suffix}")
+                found = name
+        else:
+            self.unresolved_passive += 1
+        if found and self.metrics is not None:
+            self.metrics.inc('subdomains_found_total', source=source)
+        # Permutations are only built from names that were not permuted
+        # themselves, which keeps the candidate space to a single round
+        if found and addresses and self.permutations and source != 'permutation':
+            self.queue_permutations(found)
+        if self.depth > 1:
+            if status == 'NXDOMAIN':
+                self.record_nxdomain(name)
+            elif (found or (status == 'NODATA' and source in self.GENERATED_SOURCES)) and self.level(name) < self.depth:
+                # Empty non-terminals (NODATA) have children, so they are
+                # descended into as well even though they are not reported
+                self.queue_recursion(name)
+
+    def candidate_done(self, name, source):
+        if source == 'bruteforce':
+            self.checkpoint.done(name)
+        elif source not in self.GENERATED_SOURCES:
+            with self.state_lock:
+                self.passive_pending -= 1
+
+    def passive_completed(self):
+        # Searches that succeeded, once every name the passive sources emitted
+        # has been resolved; failed searches are retried on resume
+        with self.state_lock:
+            if self.passive_pending > 0:
+                return set()
+            return set(self.passive_succeeded)
+
+    def iter_permutations(self, name):
+        # altdns-style mutations of one discovered name, produced lazily:
+        # api.x.com -> api2.x.com, api-dev.x.com, devapi.x.com, dev.api.x.com, ...
+        label, parent = name.split('.', 1)
+        match = re.match(r'^(.*?)(\d+)$', label)
+        if match:
+            number = int(match.group(2))
+            for value in (number - 1, number + 1):
+                if value >= 0:
+                    yield f"{match.group(1)}{value}.{parent}"
+        else:
+            for value in range(1, 4):
+                yield f"{label}{value}.{parent}"
+        for word in list(self.permutation_words):
+            if word == label:
+                continue
+            yield f"{word}.{name}"
+            yield f"{label}-{word}.{parent}"
+            yield f"{word}-{label}.{parent}"
+            yield f"{label}{word}.{parent}"
+            yield f"{word}{label}.{parent}"
+            if parent != self.domain:
+                # Sibling under the same deeper parent
+                yield f"{word}.{parent}"
+            if '-' in label:
+                for part in label.split('-'):
+                    yield f"{label.replace(part, word, 1)}.{parent}"
+
+    def queue_permutations(self, name):
+        with self.state_lock:
+            for label in name[:-len(self.domain) - 1].split('.'):
+                if (label not in self.known_permutation_words and len(label) <= 20
+                        and len(self.permutation_words) < self.MAX_PERMUTATION_WORDS):
+                    self.known_permutation_words.add(label)
+                    self.permutation_words.append(label)
+            self.permutation_seeds.append(name)
+            if self.permutation_running or self.pipeline is None:
+                return
+            self.permutation_running = True
+        # Registered from the sink before the result is finished, so the
+        # pipeline cannot close while permutations are still to come
+        self.pipeline.add_source(self.permutation_source)
+
+    def permutation_source(self):
+        # Single feedback source; exits once there is nothing left to permute
+        # and is restarted by queue_permutations when new names are found
+        while True:
+            with self.state_lock:
+                if not self.permutation_seeds:
+                    self.permutation_running = False
+                    return
+                seed = self.permutation_seeds.popleft()
+            for candidate in self.iter_permutations(seed):
+                # Cheap pre-check; the dedupe stage makes the final call
+                if candidate not in self.seen:
+                    self.emit(candidate, 'permutation')
+
+    def queue_recursion(self, name):
+        with self.state_lock:
+            self.recursion_seeds.append(name)
+            if self.recursion_running or self.pipeline is None:
+                return
+            self.recursion_running = True
+        self.pipeline.add_source(self.recursion_source)
+
+    def recursion_source(self):
+        # Brute-forces the wordlist under each resolved or empty non-terminal
+        # name, one seed at a time, until no seeds are left
+        while True:
+            with self.state_lock:
+                if not self.recursion_seeds:
+                    self.recursion_running = False
+                    return
+                seed = self.recursion_seeds.popleft()
+            if self.under_nxdomain(seed):
+                continue
+            for word in self.iter_wordlist():
+                self.emit(f"{word}.{seed}", 'recursive')
+
+    def add_word(self, start, end, word):
+        # Normalised up front so the checkpoint and the pipeline agree on the name
+        name = self.normalize_name(f"{word}.{self.domain}")
+        if name is None:
+            return
+        self.checkpoint.begin(name, start, end)
+        self.emit(name, 'bruteforce')
+
+    def wordlist_source(self, entries):
+        for start, end, word in entries:
+            self.add_word(start, end, word)
+
+    def passive_source(self, search_function):
+        start = time.monotonic()
+        try:
+            if search_function():
+                with self.state_lock:
+                    self.passive_succeeded.add(search_function.__name__)
+        finally:
+            with self.state_lock:
+                self.passive_running -= 1
+            if self.metrics is not None:
+                self.metrics.observe('source_fetch_seconds', time.monotonic() - start, source=search_function.__name__)
+
+    def create_pipeline(self):
+        return self.attach(DiscoveryPipeline.for_finder(self))
+
+    def attach(self, pipeline):
+        # Joins a (possibly shared) pipeline: wildcard pre-scan, so the sink
+        # never has to wait on it for the apex, and names restored from a
+        # checkpoint are permuted and recursed into again
+        self.pipeline = pipeline
+        self.detect_wildcard(self.domain)
+        for name in sorted(self.subdomains):
+            if self.permutations:
+                self.queue_permutations(name)
+            if self.level(name) < self.depth:
+                self.queue_recursion(name)
+        return pipeline
+
+    def passive_searches(self):
+        # Searches that have not completed in an earlier run, marked as
+        # running; each returned search must be run through passive_source()
+        search_functions = [
+            getattr(self, name) for name in self.PASSIVE_SOURCES if name not in self.checkpoint.passive_done
+        ]
+        with self.state_lock:
+            self.passive_running += len(search_functions)
+        return search_functions
+
+    def add_sources(self, pipeline, passive=True, entries=None):
+        if passive:
+            for search_function in self.passive_searches():
+                pipeline.add_source(self.passive_source, search_function)
+        if entries is not None:
+            pipeline.add_source(self.wordlist_source, entries)
+
+    def report(self):
+        self.pipeline = None
+        if self.wildcard_filtered:
+            print(f"[*] {self.domain}: filtered {self.wildcard_filtered} wildcard DNS answers")
+        if self.pruned:
+            print(f"[*] {self.domain}: skipped {self.pruned} candidates under NXDOMAIN names")
+        if self.unresolved_passive:
+            print(f"[*] {self.domain}: dropped {self.unresolved_passive} passive source names that no longer resolve (use --keep-unresolved to keep them)")
+
+    def brute_force(self, wordlist):
+        # Resolves just the given words through the pipeline (no passive sources)
+        pipeline = self.create_pipeline()
+        self.add_sources(pipeline, passive=False, entries=((i, i + 1, word) for i, word in enumerate(wordlist)))
+        pipeline.run()
+        self.pipeline = None
+
+    # Each search returns True when the source answered and was read in full
+
     def crt_sh_search(self):
         print("\n[*] Searching crt.sh for SSL certificates...")
         try:
             headers = {'User-Agent': self.get_random_user_agent()}
-            response = requests.get(
-                f"https://crt.sh/?q=%.{self.domain}&output=json", 
+            # Large organisations produce responses of hundreds of MB, so the
+            # body is streamed and parsed entry by entry instead of loaded whole
+            response = self.http.get(
+                f"{self.source_urls['crt.sh']}/?q=%.{self.domain}&output=json",
                 headers=headers,
-                timeout=self.timeout
+                stream=True
             )
-            if response.status_code == 200:
-                try:
-                    data = response.json()
-                    for entry in data:
-                        name_value = entry.get('name_value', '')
-                        if name_value:
-                            # Extract subdomains using regex
-                            subdomains = re.findall(r'([a-zA-Z0-9._-]+\.' + re.escape(self.domain) + ')', name_value)
-                            for subdomain in subdomains:
-                                if subdomain not in self.subdomains and subdomain != self.domain:
-                                    self.subdomains.add(subdomain)
-                                    print(f"[+] Discovered from crt.sh: {subdomain}")
-                except Exception as e:
-                    print(f"[-] Error parsing crt.sh response: {e}")
+            with response:
+                if response.status_code == 200:
+                    try:
+                        for entry in iter_json_array(response.iter_content(256 * 1024)):
+                            name_value = entry.get('name_value', '')
+                            if name_value:
+                                # Extract subdomains using regex
+                                for subdomain in self.name_pattern.findall(name_value):
+                                    self.emit(subdomain, 'crt.sh')
+                        return True
+                    except Exception as e:
+                        print(f"[-] Error parsing crt.sh response: {e}")
+                        return False
+                print(f"[-] crt.sh returned HTTP {response.status_code}")
+                return False
         except Exception as e:
             print(f"[-] Error searching crt.sh: {e}")
             print("[*] Trying alternative crt.sh query method...")
             try:
                 # Alternative method with text search
-                response = requests.get(
-                    f"https://crt.sh/?q=%.{self.domain}", 
-                    headers={'User-Agent': self.get_random_user_agent()},
-                    timeout=self.timeout
+                response = self.http.get(
+                    f"{self.source_urls['crt.sh']}/?q=%.{self.domain}",
+                    headers={'User-Agent': self.get_random_user_agent()}
                 )
                 if response.status_code == 200:
                     # Extract domains using regex
                     pattern = r'<TD>([a-zA-Z0-9._-]+\.' + re.escape(self.domain) + ')</TD>'
-                    subdomains = re.findall(pattern, response.text)
+                    subdomains = re.findall(pattern, response.text, re.IGNORECASE)
                     for subdomain in subdomains:
-                        if subdomain not in self.subdomains and subdomain != self.domain:
-                            self.subdomains.add(subdomain)
-                            print(f"[+] Discovered from crt.sh (alt): {subdomain}")
+                        self.emit(subdomain, 'crt.sh (alt)')
+                    return True
             except Exception as e:
                 print(f"[-] Error with alternative crt.sh search: {e}")
+            return False
     
     def search_virustotal(self):
         print("\n[*] Searching VirusTotal for subdomains...")
         try:
             headers = {'User-Agent': self.get_random_user_agent()}
-            response = requests.get(
-                f"https://www.virustotal.com/ui/domains/{self.domain}/subdomains?limit=40", 
-                headers=headers, 
-                timeout=self.timeout
-            )
-            if response.status_code == 200:
+            base_url = f"{self.source_urls['virustotal']}/ui/domains/{self.domain}/subdomains?limit=40"
+            url = base_url
+            # Results come 40 at a time; follow the cursor until it runs out
+            for _ in range(self.max_pages):
+                response = self.http.get(url, headers=headers)
+                if response.status_code != 200:
+                    print(f"[-] VirusTotal returned HTTP {response.status_code}")
+                    return False
                 data = response.json()
                 for item in data.get('data', []):
                     subdomain = item.get('id')
-                    if subdomain and subdomain not in self.subdomains:
-                        self.subdomains.add(subdomain)
-                        print(f"[+] Discovered from VirusTotal: {subdomain}")
+                    if subdomain:
+                        self.emit(subdomain, 'VirusTotal')
+                url = data.get('links', {}).get('next')
+                cursor = data.get('meta', {}).get('cursor')
+                if not url and cursor:
+                    url = f"{base_url}&cursor={cursor}"
+                if not url or not data.get('data'):
+                    break
+            return True
         except Exception as e:
             print(f"[-] Error searching VirusTotal: {e}")
+            return False
     
     def search_alienvault(self):
         print("\n[*] Searching AlienVault OTX for subdomains...")
         try:
             headers = {'User-Agent': self.get_random_user_agent()}
-            response = requests.get(
-                f"https://otx.alienvault.com/api/v1/indicators/domain/{self.domain}/passive_dns", 
-                headers=headers, 
-                timeout=self.timeout
-            )
-            if response.status_code == 200:
-                data = response.json()
+            url = f"{self.source_urls['alienvault']}/api/v1/indicators/domain/{self.domain}/passive_dns"
+            page_size = 500
+
+            def fetch(page):
+                response = self.http.get(url, headers=headers, params={'limit': page_size, 'page': page})
+                if response.status_code != 200:
+                    raise RuntimeError(f"HTTP {response.status_code} for page {page}")
+                return response.json()
+
+            def collect(data):
                 for entry in data.get('passive_dns', []):
                     hostname = entry.get('hostname', '')
-                    if hostname and self.domain in hostname and hostname not in self.subdomains:
-                        self.subdomains.add(hostname)
-                        print(f"[+] Discovered from AlienVault: {hostname}")
+                    if hostname:
+                        self.emit(hostname, 'AlienVault')
+
+            data = fetch(1)
+            collect(data)
+            if data.get('count', 0) > len(data.get('passive_dns', [])):
+                # OTX reports the total count, so the remaining pages are known
+                # up front and can be fetched concurrently instead of one by one
+                pages = min(self.max_pages, math.ceil(data['count'] / page_size))
+                with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
+                    for page_data in executor.map(fetch, range(2, pages + 1)):
+                        collect(page_data)
+            else:
+                page = 1
+                while data.get('has_next') and page < self.max_pages:
+                    page += 1
+                    data = fetch(page)
+                    collect(data)
+            return True
         except Exception as e:
             print(f"[-] Error searching AlienVault: {e}")
+            return False
     
     def search_hackertarget(self):
         print("\n[*] Searching HackerTarget for subdomains...")
         try:
             headers = {'User-Agent': self.get_random_user_agent()}
-            response = requests.get(
-                f"https://api.hackertarget.com/hostsearch/?q={self.domain}", 
-                headers=headers, 
-                timeout=self.timeout
+            response = self.http.get(
+                f"{self.source_urls['hackertarget']}/hostsearch/?q={self.domain}",
+                headers=headers
             )
-            if response.status_code == 200 and not response.text.startswith('error'):
-                results = response.text.strip().split('\n')
-                for result in results:
-                    if ',' in result:
-                        subdomain = result.split(',')[0]
-                        if subdomain and subdomain not in self.subdomains:
-                            self.subdomains.add(subdomain)
-                            print(f"[+] Discovered from HackerTarget: {subdomain}")
+            if response.status_code != 200 or response.text.startswith('error'):
+                print(f"[-] HackerTarget returned HTTP {response.status_code}: {response.text[:100].strip()}")
+                return False
+            results = response.text.strip().split('\n')
+            for result in results:
+                if ',' in result:
+                    subdomain = result.split(',')[0]
+                    if subdomain:
+                        self.emit(subdomain, 'HackerTarget')
+            return True
         except Exception as e:
             print(f"[-] Error searching HackerTarget: {e}")
+            return False
     
     def save_results(self):
         if not self.subdomains:
             print("\n[-] No subdomains found.")
-            return
+            return True
             
         try:
-            with open(self.output_file, 'w') as f:
-                for subdomain in sorted(self.subdomains):
-                    f.write(f"{subdomain}\n")
+            if self.results is not None:
+                # Sorted from the JSONL stream on disk rather than from memory
+                count = external_sort(self.results.names(), self.output_file)
+            else:
+                count = external_sort(self.subdomains, self.output_file)
             print(f"\n[+] Results saved to {self.output_file}")
-            print(f"[+] Total unique subdomains found: {len(self.subdomains)}")
+            if self.results is not None:
+                print(f"[+] Records saved to {self.results.path}")
+            print(f"[+] Total unique subdomains found: {count}")
+            return True
         except Exception as e:
             print(f"[-] Error saving results: {e}")
+            return False
     
     def run(self):
         print(f"\n[*] Starting subdomain discovery for {self.domain}")
         print(f"[*] Results will be saved to {self.output_file}")
-        
-        # Create a thread pool for online sources
-        with concurrent.futures.ThreadPoolExecutor(max_workers=4) as executor:
-            search_functions = [
-                self.crt_sh_search,
-                self.search_virustotal,
-                self.search_alienvault,
-                self.search_hackertarget
-            ]
-            executor.map(lambda fn: fn(), search_functions)
-            
-        # Then do brute force with wordlist
-        wordlist = self.load_wordlist()
-        if wordlist:
-            print(f"\n[*] Starting DNS brute force with {len(wordlist)} subdomains...")
-            with concurrent.futures.ThreadPoolExecutor(max_workers=self.threads) as executor:
-                executor.map(self.dns_brute_force, wordlist)
-        
+        if self.resume:
+            print(f"[*] Resuming from {self.checkpoint.path} at wordlist position {self.checkpoint.read_position} "
+                  f"with {len(self.subdomains)} subdomains already found")
+
+        self.checkpoint.start(self)
+        try:
+            pipeline = self.create_pipeline()
+            source = self.wordlist_file or 'built-in wordlist'
+            print(f"\n[*] Starting passive sources and DNS brute force from {source} ({self.engine} engine)...")
+            self.add_sources(
+                pipeline,
+                passive=True,
+                entries=self.iter_wordlist_entries(self.checkpoint.read_position)
+            )
+            pipeline.run()
+            self.report()
+            if len(self.pool.upstreams) > 1:
+                print("[*] Resolver statistics:")
+                for line in self.pool.summary():
+                    print(f"    {line}")
+        except KeyboardInterrupt:
+            self.checkpoint.stop()
+            self.checkpoint.save(self)
+            print(f"\n[!] Interrupted, progress saved to {self.checkpoint.path} (rerun with --resume)")
+            return
+        finally:
+            if self.cache is not None:
+                self.cache.close()
+            if self.results is not None:
+                self.results.flush()
+        self.checkpoint.stop()
+
         # Save results to file
-        self.save_results()
+        if self.save_results():
+            self.checkpoint.remove()
 
-def main():
-    parser = argparse.ArgumentParser(description='Subdomain finder tool')
-    parser.add_argument('domain', help='Target domain to scan for subdomains')
-    parser.add_argument('-w', '--wordlist', help='Path to wordlist file for brute forcing')
-    parser.add_argument('-o', '--output', help='Output file to save results')
-    parser.add_argument('-t', '--threads', type=int, default=10, help='Number of threads for brute forcing')
-    parser.add_argument('--timeout', type=int, default=5, help='Timeout for HTTP requests in seconds')
-    args = parser.parse_args()
+class BatchScanner:
+    # Scans many domains in one process. All finders share one pipeline,
+    # resolver pool, HTTP client and DNS cache; the wordlist is read and
+    # deduplicated once and fed round-robin across the domains (every domain
+    # gets the next word before any domain gets the one after), so a single
+    # domain can never starve the others. Each finder keeps its own small
+    # dedupe filter for passive, derived and permuted names.
+    def __init__(self, domains, wordlist=None, output_dir=None, passive_workers=8, resume=False,
+                 checkpoint_interval=30, cache=DEFAULT_CACHE_PATH, resolvers=None, http=None, **kwargs):
+        self.wordlist_file = wordlist
+        self.output_dir = output_dir
+        self.passive_workers = passive_workers
+        self.checkpoint_interval = checkpoint_interval
+        if output_dir:
+            os.makedirs(output_dir, exist_ok=True)
+        self.cache = cache if isinstance(cache, DNSCache) else (DNSCache(cache) if cache else None)
+        self.http = http or HTTPClient(timeout=kwargs.get('timeout', 5))
+        self.pool = resolvers
+        self.finders = []
+        for domain in dict.fromkeys(domains):
+            finder = SubdomainFinder(
+                domain,
+                wordlist=wordlist,
+                output=os.path.join(output_dir, f"{domain}_subdomains.txt") if output_dir else None,
+                checkpoint=os.path.join(output_dir or '.', f"{domain}_checkpoint.json"),
+                checkpoint_interval=checkpoint_interval,
+                resume=resume,
+                cache=self.cache,
+                resolvers=self.pool,
+                http=self.http,
+                seen=ScalableBloomFilter(10000, name=f'candidate dedupe filter for {domain}'),
+                **kwargs
+            )
+            # The first finder builds the default pool; the rest reuse it
+            self.pool = finder.pool
+            self.finders.append(finder)
+        self.stop_event = threading.Event()
+
+    @staticmethod
+    def read_domains(path):
+        domains = []
+        with open(path, 'r', encoding='utf-8', errors='ignore') as f:
+            for line in f:
+                domain = line.strip().lower().rstrip('.')
+                if domain and not domain.startswith('#'):
+                    domains.append(domain)
+        return domains
+
+    def passive_source(self):
+        # Passive lookups for every domain through a bounded set of workers
+        # instead of four threads per domain
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, self.passive_workers)) as executor:
+            for finder in self.finders:
+                for search_function in finder.passive_searches():
+                    executor.submit(finder.passive_source, search_function)
+
+    def wordlist_source(self):
+        finders = self.finders
+        start = min(finder.checkpoint.read_position for finder in finders)
+        for entry in finders[0].iter_wordlist_entries(start):
+            for finder in finders:
+                # Resumed domains skip the words they already finished
+                if entry[0] >= finder.checkpoint.read_position:
+                    finder.add_word(*entry)
+
+    def save_checkpoints(self):
+        for finder in self.finders:
+            try:
+                finder.checkpoint.save(finder)
+            except Exception as e:
+                print(f"[-] Error saving checkpoint for {finder.domain}: {e}")
+
+    def checkpoint_loop(self):
+        while not self.stop_event.wait(self.checkpoint_interval):
+            self.save_checkpoints()
+
+    def run(self):
+        if not self.finders:
+            print("[-] No domains to scan")
+            return
+        source = self.wordlist_file or 'built-in wordlist'
+        print(f"\n[*] Starting batch discovery for {len(self.finders)} domains with {source}")
+        checkpoints = threading.Thread(target=self.checkpoint_loop, daemon=True)
+        checkpoints.start()
+        try:
+            pipeline = DiscoveryPipeline.for_finder(self.finders[0])
+            # Wildcard pre-scans for all domains run in parallel
+            with concurrent.futures.ThreadPoolExecutor(max_workers=max(1, self.finders[0].threads)) as executor:
+                list(executor.map(lambda finder: finder.attach(pipeline), self.finders))
+            pipeline.add_source(self.passive_source)
+            pipeline.add_source(self.wordlist_source)
+            pipeline.run()
+            self.stop_event.set()
+            for finder in self.finders:
+                finder.report()
+            if len(self.pool.upstreams) > 1:
+                print("[*] Resolver statistics:")
+                for line in self.pool.summary():
+                    print(f"    {line}")
+        except KeyboardInterrupt:
+            self.stop_event.set()
+            # Checkpoint saves flush each domain's JSONL file as well
+            self.save_checkpoints()
+            print("\n[!] Interrupted, progress saved per domain (rerun with --resume)")
+            return
+        finally:
+            self.stop_event.set()
+            if self.cache is not None:
+                self.cache.close()
+
+        total = 0
+        for finder in self.finders:
+            if finder.save_results():
+                finder.checkpoint.remove()
+            total += len(finder.subdomains)
+        print(f"\n[+] Batch finished: {total} subdomains across {len(self.finders)} domains")
+
+def run_scan(args, metrics=None):
+    # Single domain or -L batch, as selected on the command line
+    resolvers = ResolverPool.from_argument(args.resolvers) if args.resolvers else None
+    http = HTTPClient(timeout=args.timeout, retries=args.http_retries, max_bytes=args.max_response_size * 1024 * 1024)
+    if args.domain_list:
+        domains = BatchScanner.read_domains(args.domain_list)
+        if args.domain:
+            domains.insert(0, args.domain)
+        BatchScanner(
+            domains,
+            wordlist=args.wordlist,
+            output_dir=args.output,
+            jsonl=False if args.no_jsonl else None,
+            passive_workers=args.passive_workers,
+            resume=args.resume,
+            checkpoint_interval=args.checkpoint_interval,
+            cache=None if args.no_cache else args.cache,
+            resolvers=resolvers,
+            http=http,
+            threads=args.threads,
+            timeout=args.timeout,
+            engine=args.engine,
+            concurrency=args.concurrency,
+            sockets=args.sockets,
+            processes=args.processes,
+            keep_unresolved=args.keep_unresolved,
+            permutations=args.permutations,
+            permutation_words=args.permutation_words,
+            depth=args.depth,
+            metrics=metrics
+        ).run()
+        return
     
     finder = SubdomainFinder(
         domain=args.domain,
         wordlist=args.wordlist,
         output=args.output,
+        jsonl=False if args.no_jsonl else args.jsonl,
         threads=args.threads,
-        timeout=args.timeout
+        timeout=args.timeout,
+        engine=args.engine,
+        concurrency=args.concurrency,
+        sockets=args.sockets,
+        checkpoint=args.checkpoint,
+        checkpoint_interval=args.checkpoint_interval,
+        resume=args.resume,
+        cache=None if args.no_cache else args.cache,
+        resolvers=resolvers,
+        http=http,
+        keep_unresolved=args.keep_unresolved,
+        permutations=args.permutations,
+        permutation_words=args.permutation_words,
+        depth=args.depth,
+        processes=args.processes,
+        metrics=metrics
     )
     finder.run()
 
+def main():
+    parser = argparse.ArgumentParser(description='Subdomain finder tool')
+    parser.add_argument('domain', nargs='?', help='Target domain to scan for subdomains')
+    parser.add_argument('-L', '--domain-list', help='File with one domain per line to scan in a single batch')
+    parser.add_argument('--passive-workers', type=int, default=8, help='Concurrent passive source lookups in batch mode')
+    parser.add_argument('-w', '--wordlist', help='Path to wordlist file for brute forcing')
+    parser.add_argument('-o', '--output', help='Output file to save results (output directory with -L)')
+    parser.add_argument('--jsonl', help='JSONL file the records are streamed to (default: output file with a .jsonl extension)')
+    parser.add_argument('--no-jsonl', action='store_true', help='Do not write the JSONL record file')
+    parser.add_argument('-t', '--threads', type=int, default=10, help='Number of threads for brute forcing')
+    parser.add_argument('--timeout', type=int, default=5, help='Timeout for HTTP requests in seconds')
+    parser.add_argument('-e', '--engine', choices=['threads', 'async', 'bulk'], default='threads', help='DNS resolution engine for brute forcing')
+    parser.add_argument('-c', '--concurrency', type=int, default=1000, help='Maximum in-flight DNS queries for the async and bulk engines')
+    parser.add_argument('--sockets', type=int, default=4, help='Number of UDP sockets used by the bulk engine')
+    parser.add_argument('-p', '--processes', type=int, default=1, help='Resolve in this many worker processes, each running the bulk engine')
+    parser.add_argument('--checkpoint', help='Checkpoint file (default: <domain>_checkpoint.json)')
+    parser.add_argument('--checkpoint-interval', type=int, default=30, help='Seconds between checkpoint saves')
+    parser.add_argument('--resume', action='store_true', help='Resume from the last checkpoint')
+    parser.add_argument('--cache', default=DEFAULT_CACHE_PATH, help='Persistent DNS cache file shared across runs')
+    parser.add_argument('--no-cache', action='store_true', help='Disable the persistent DNS cache')
+    parser.add_argument('--http-retries', type=int, default=3, help='Retries for passive source requests on errors, 429 and 5xx')
+    parser.add_argument('--max-response-size', type=int, default=64, help='Maximum passive source response size in MB')
+    parser.add_argument('-d', '--depth', type=int, default=1, help='Brute-force recursively under discovered subdomains up to this many labels deep (default: 1)')
+    parser.add_argument('--permutations', action='store_true', help='Resolve altdns-style permutations of discovered subdomains')
+    parser.add_argument('--permutation-words', help='Words file for permutations (default: built-in list)')
+    parser.add_argument('--keep-unresolved', action='store_true', help='Keep passive source names that do not resolve')
+    parser.add_argument('-r', '--resolvers', help='Comma separated resolvers or a file with one per line (ip or ip:port)')
+    parser.add_argument('--stats-interval', type=int, default=0, help='Print a JSON stats line to stderr every N seconds (default: off)')
+    parser.add_argument('--metrics-port', type=int, help='Serve Prometheus metrics on 127.0.0.1:PORT/metrics')
+    args = parser.parse_args()
+    if not args.domain and not args.domain_list:
+        parser.error('a domain or --domain-list is required')
+
+    metrics = None
+    if args.stats_interval or args.metrics_port is not None:
+        metrics = Metrics()
+        if args.stats_interval:
+            metrics.start_reporter(args.stats_interval)
+        if args.metrics_port is not None:
+            metrics.serve(args.metrics_port)
+    try:
+        run_scan(args, metrics)
+    finally:
+        if metrics is not None:
+            if args.stats_interval:
+                print(json.dumps(metrics.snapshot()), file=sys.stderr)
+            metrics.stop()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,252 @@
+# @title Zone Transfer Archive
+# @markdown Written by dns_zone_transfer.py --archive: python zone_archive.py --data 203.0.113.7 to find every captured zone containing a value
+# @Galang Aprilian - 2025
+import argparse
+import threading
+import json
+import os
+import time
+from datetime import datetime
+from sqlite_store import open_database, transaction
+
+DEFAULT_ARCHIVE_PATH = 'zone_archive.db'
+# Uncommitted snapshots older than this were left by a run that died; newer
+# ones may belong to a transfer still running in another process
+STALE_CAPTURE_SECONDS = 3600
+# Types whose data ends in a host name, indexed separately as the target
+TARGET_TYPES = ('CNAME', 'DNAME', 'NS', 'PTR', 'MX', 'SRV')
+
+class ZoneArchive:
+    # Every captured zone transfer as a snapshot row plus its records, indexed
+    # by owner name and by record data (both case-insensitive, with the type)
+    # so "which zones point at this IP / CNAME target" is an index lookup
+    # instead of a grep over transfer files. Owner names and the host names
+    # at the end of CNAME/NS/MX/SRV/... data are also stored with their labels
+    # reversed (www.example.com. -> com.example.www.), which turns
+    # *.example.com queries into index range scans. Snapshots being written
+    # are invisible to queries until they are committed.
+    def __init__(self, path=DEFAULT_ARCHIVE_PATH, batch_size=5000):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.conn = open_database(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS snapshots ('
+            'id INTEGER PRIMARY KEY, domain TEXT NOT NULL, nameserver TEXT NOT NULL, address TEXT NOT NULL, '
+            'serial INTEGER, captured REAL NOT NULL, records INTEGER, complete INTEGER)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS snapshots_domain ON snapshots (domain, captured)')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            'snapshot INTEGER NOT NULL, name TEXT NOT NULL, rdtype TEXT NOT NULL, data TEXT NOT NULL, ttl INTEGER NOT NULL, '
+            'rname TEXT, rtarget TEXT)'
+        )
+        self._add_reversed_columns()
+        self.conn.execute('CREATE INDEX IF NOT EXISTS records_name ON records (name COLLATE NOCASE, rdtype)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS records_data ON records (data COLLATE NOCASE, rdtype)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS records_rname ON records (rname, rdtype)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS records_rtarget ON records (rtarget, rdtype)')
+        self.conn.execute('CREATE INDEX IF NOT EXISTS records_snapshot ON records (snapshot)')
+        # Snapshots left uncommitted by an interrupted run
+        stale = time.time() - STALE_CAPTURE_SECONDS
+        with self.lock, transaction(self.conn):
+            self.conn.execute('DELETE FROM records WHERE snapshot IN '
+                              '(SELECT id FROM snapshots WHERE complete IS NULL AND captured < ?)', (stale,))
+            self.conn.execute('DELETE FROM snapshots WHERE complete IS NULL AND captured < ?', (stale,))
+
+    def _add_reversed_columns(self):
+        # Archives written before the reversed columns existed are filled in once
+        columns = [row[1] for row in self.conn.execute('PRAGMA table_info(records)')]
+        if 'rname' in columns:
+            return
+        with self.lock, transaction(self.conn):
+            self.conn.execute('ALTER TABLE records ADD COLUMN rname TEXT')
+            self.conn.execute('ALTER TABLE records ADD COLUMN rtarget TEXT')
+            rows = self.conn.execute('SELECT rowid, name, rdtype, data FROM records').fetchall()
+            self.conn.executemany(
+                'UPDATE records SET rname = ?, rtarget = ? WHERE rowid = ?',
+                ((self.reverse(name), self.target(rdtype, data), rowid) for rowid, name, rdtype, data in rows)
+            )
+
+    @staticmethod
+    def reverse(name):
+        # Lower-case name with its labels reversed; absolute and relative
+        # names reverse the same way
+        return '.'.join(reversed(name.lower().rstrip('.').split('.'))) + '.'
+
+    @classmethod
+    def target(cls, rdtype, data):
+        if rdtype not in TARGET_TYPES:
+            return None
+        return cls.reverse(data.split()[-1])
+
+    def capture(self, domain, nameserver, address):
+        return ArchiveCapture(self, domain, nameserver, address)
+
+    def query(self, name=None, data=None, rdtype=None, domain=None, latest=False, limit=100):
+        # Records matching all given filters, newest snapshots first. name and
+        # data match exactly (case-insensitive) unless they contain '*'; a
+        # host name given as data also matches the target of MX, SRV, NS,
+        # CNAME, DNAME and PTR records, e.g. mail.example.com finds
+        # "10 mail.example.com."
+        where = ['s.complete IS NOT NULL']
+        params = []
+        if name:
+            where.append(self._match('r.name', 'r.rname', self._absolute(name), params))
+        if data:
+            if '*' in data:
+                where.append(self._match('r.data', 'r.rtarget', data, params))
+            elif not any(c.isalpha() for c in data):
+                where.append(self._match('r.data', None, data, params))
+            else:
+                # Host names in rdata are stored absolute
+                host = self._absolute(data)
+                where.append('(r.rtarget = ? OR r.data = ? COLLATE NOCASE OR r.data = ? COLLATE NOCASE)')
+                params.extend([self.reverse(host), data, host])
+        if rdtype:
+            where.append('r.rdtype = ?')
+            params.append(rdtype.upper())
+        if domain:
+            where.append('s.domain = ?')
+            params.append(domain.lower().rstrip('.'))
+        if latest:
+            where.append('s.id IN (SELECT MAX(id) FROM snapshots WHERE complete IS NOT NULL '
+                         'GROUP BY domain, nameserver, address)')
+        sql = ('SELECT s.domain, s.nameserver, s.address, s.serial, s.captured, r.name, r.ttl, r.rdtype, r.data '
+               'FROM records r JOIN snapshots s ON s.id = r.snapshot WHERE ' + ' AND '.join(where) +
+               ' ORDER BY s.captured DESC, r.name, r.rdtype')
+        if limit:
+            sql += f' LIMIT {int(limit)}'
+        with self.lock:
+            return self.conn.execute(sql, params).fetchall()
+
+    @staticmethod
+    def _absolute(name):
+        return name if name.endswith('.') or name.endswith('*') else name + '.'
+
+    @classmethod
+    def _match(cls, column, reversed_column, value, params):
+        if reversed_column and value.startswith('*.') and '*' not in value[2:]:
+            # Names below a suffix: a range of the reversed column, so
+            # *.example.com is com.example.* and can use its index. '/' sorts
+            # right after '.', which bounds the range.
+            prefix = cls.reverse(value[2:])
+            params.extend([prefix, prefix[:-1] + '/'])
+            return f'({reversed_column} > ? AND {reversed_column} < ?)'
+        if '*' in value:
+            # LIKE is case-insensitive and can use the NOCASE index for
+            # prefixes; % and _ in the value itself are matched literally
+            escaped = value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+            params.append(escaped.replace('*', '%'))
+            return f"{column} LIKE ? ESCAPE '\\'"
+        params.append(value)
+        return f'{column} = ? COLLATE NOCASE'
+
+    def snapshots(self, domain=None):
+        sql = 'SELECT id, domain, nameserver, address, serial, captured, records, complete FROM snapshots WHERE complete IS NOT NULL'
+        params = []
+        if domain:
+            sql += ' AND domain = ?'
+            params.append(domain.lower().rstrip('.'))
+        with self.lock:
+            return self.conn.execute(sql + ' ORDER BY domain, captured', params).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+class ArchiveCapture:
+    # One zone transfer being written to the archive; add() takes the
+    # (name, class, type, data, ttl) records of dns_zone_transfer.py
+    def __init__(self, archive, domain, nameserver, address):
+        self.archive = archive
+        self.domain = domain.lower().rstrip('.')
+        self.origin = self.domain + '.'
+        self.serial = None
+        self.count = 0
+        self.rows = []
+        with archive.lock:
+            self.id = archive.conn.execute(
+                'INSERT INTO snapshots (domain, nameserver, address, captured) VALUES (?, ?, ?, ?)',
+                (self.domain, nameserver, address, time.time())
+            ).lastrowid
+
+    def add(self, record):
+        name, rdclass, rdtype, data, ttl = record
+        if self.serial is None and rdtype == 'SOA' and name.lower() == self.origin:
+            self.serial = int(data.split()[2])
+        self.rows.append((self.id, name, rdtype, data, ttl, ZoneArchive.reverse(name), ZoneArchive.target(rdtype, data)))
+        self.count += 1
+        if len(self.rows) >= self.archive.batch_size:
+            self._flush()
+
+    def _flush(self):
+        # One transaction per batch; autocommit would sync every row
+        with self.archive.lock, transaction(self.archive.conn):
+            self.archive.conn.executemany(
+                'INSERT INTO records (snapshot, name, rdtype, data, ttl, rname, rtarget) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                self.rows
+            )
+        self.rows.clear()
+
+    def commit(self, complete=True):
+        # complete=False keeps a transfer that was cut short by a record/byte cap
+        self._flush()
+        with self.archive.lock:
+            self.archive.conn.execute(
+                'UPDATE snapshots SET serial = ?, records = ?, complete = ? WHERE id = ?',
+                (self.serial, self.count, int(complete), self.id)
+            )
+
+    def rollback(self):
+        self.rows.clear()
+        with self.archive.lock:
+            self.archive.conn.execute('DELETE FROM records WHERE snapshot = ?', (self.id,))
+            self.archive.conn.execute('DELETE FROM snapshots WHERE id = ?', (self.id,))
+
+def main():
+    parser = argparse.ArgumentParser(description='Query the zone transfers archived by dns_zone_transfer.py --archive')
+    parser.add_argument('-a', '--archive', default=DEFAULT_ARCHIVE_PATH, help='Archive database file')
+    parser.add_argument('-n', '--name', help='Owner name, e.g. www.example.com or *.example.com')
+    parser.add_argument('-d', '--data', help='Record data, e.g. an IP address or a CNAME/MX/SRV target host, '
+                                             'or *.example.com for every target below a domain (* as wildcard)')
+    parser.add_argument('-t', '--type', help='Record type, e.g. A, CNAME, MX')
+    parser.add_argument('-z', '--zone', help='Only this zone')
+    parser.add_argument('--latest', action='store_true', help='Only the latest snapshot of each zone and nameserver')
+    parser.add_argument('--limit', type=int, default=100, help='Maximum number of records to show (0 for all)')
+    parser.add_argument('--list', action='store_true', help='List the archived snapshots instead')
+    parser.add_argument('--json', action='store_true', help='Print JSON lines')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.archive):
+        print(f"[-] Archive {args.archive} does not exist")
+        return
+    archive = ZoneArchive(args.archive)
+    start = time.perf_counter()
+    if args.list or not (args.name or args.data or args.type or args.zone):
+        for snapshot_id, domain, nameserver, address, serial, captured, count, complete in archive.snapshots(args.zone):
+            captured = datetime.fromtimestamp(captured).strftime('%Y-%m-%d %H:%M:%S')
+            if args.json:
+                print(json.dumps({'id': snapshot_id, 'zone': domain, 'nameserver': nameserver, 'address': address,
+                                  'serial': serial, 'captured': captured, 'records': count, 'complete': bool(complete)}))
+            else:
+                print(f"#{snapshot_id} {domain} from {nameserver} ({address}) serial {serial} at {captured}: "
+                      f"{count} records{'' if complete else ' (truncated)'}")
+        archive.close()
+        return
+
+    rows = archive.query(args.name, args.data, args.type, args.zone, args.latest, args.limit)
+    elapsed = (time.perf_counter() - start) * 1000
+    for domain, nameserver, address, serial, captured, name, ttl, rdtype, data in rows:
+        captured = datetime.fromtimestamp(captured).strftime('%Y-%m-%d %H:%M:%S')
+        if args.json:
+            print(json.dumps({'zone': domain, 'nameserver': nameserver, 'address': address, 'serial': serial,
+                              'captured': captured, 'name': name, 'ttl': ttl, 'type': rdtype, 'data': data}))
+        else:
+            print(f"{domain} [{nameserver} ({address}) serial {serial} at {captured}] {name} {ttl} {rdtype} {data}")
+    if not args.json:
+        print(f"[*] {len(rows)} records in {elapsed:.1f} ms")
+    archive.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# @title Zone Snapshot Store
+# @markdown Used by dns_zone_transfer.py --monitor: python zone_snapshot.py [snapshots.db] to list the stored zones
+# @Galang Aprilian - 2025
+import argparse
+import threading
+import os
+import time
+from datetime import datetime
+from sqlite_store import open_database, transaction
+
+DEFAULT_SNAPSHOT_PATH = 'zone_snapshots.db'
+# Staged rows of a run that has not started a transfer for this long were left
+# by a process that died
+STALE_RUN_SECONDS = 3600
+
+class ZoneSnapshots:
+    # SOA serial and record set of the last successful transfer for each
+    # (domain, nameserver address), used as the base for IXFR requests.
+    # Records are (name, class, type, data, ttl) text tuples with absolute
+    # names and are keyed without their TTL. Full transfers are staged on
+    # disk and swapped in at the end, so a failed or truncated transfer never
+    # replaces the previous snapshot.
+    def __init__(self, path=DEFAULT_SNAPSHOT_PATH, batch_size=5000):
+        self.path = path
+        self.batch_size = batch_size
+        self.lock = threading.Lock()
+        self.conn = open_database(path)
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS zones ('
+            'domain TEXT NOT NULL, server TEXT NOT NULL, serial INTEGER NOT NULL, '
+            'updated REAL NOT NULL, PRIMARY KEY (domain, server)) WITHOUT ROWID'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS records ('
+            'domain TEXT NOT NULL, server TEXT NOT NULL, name TEXT NOT NULL, rdclass TEXT NOT NULL, '
+            'rdtype TEXT NOT NULL, data TEXT NOT NULL, ttl INTEGER NOT NULL, '
+            'PRIMARY KEY (domain, server, name, rdclass, rdtype, data)) WITHOUT ROWID'
+        )
+        # Staged full transfers, keyed by a random id per open store so several
+        # processes can monitor into the same file; only the rows of runs that
+        # went stale are dropped
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS runs (run TEXT NOT NULL PRIMARY KEY, active REAL NOT NULL) WITHOUT ROWID'
+        )
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS staged ('
+            'run TEXT NOT NULL, transfer INTEGER NOT NULL, name TEXT NOT NULL, rdclass TEXT NOT NULL, '
+            'rdtype TEXT NOT NULL, data TEXT NOT NULL, ttl INTEGER NOT NULL, '
+            'PRIMARY KEY (run, transfer, name, rdclass, rdtype, data)) WITHOUT ROWID'
+        )
+        # Unscoped staging table of older versions
+        self.conn.execute('DROP TABLE IF EXISTS staging')
+        self.run = os.urandom(8).hex()
+        stale = time.time() - STALE_RUN_SECONDS
+        with self.lock, transaction(self.conn):
+            self.conn.execute('DELETE FROM staged WHERE run NOT IN (SELECT run FROM runs WHERE active >= ?)', (stale,))
+            self.conn.execute('DELETE FROM runs WHERE active < ?', (stale,))
+            self.conn.execute('INSERT INTO runs VALUES (?, ?)', (self.run, time.time()))
+        self.next_transfer = 0
+        self.pending = {}
+
+    def serial(self, domain, server):
+        # Serial of the stored snapshot, or None if there is none yet
+        with self.lock:
+            row = self.conn.execute(
+                'SELECT serial FROM zones WHERE domain = ? AND server = ?', (domain, server)
+            ).fetchone()
+        return row[0] if row else None
+
+    def begin(self):
+        # Returns the id under which a full transfer is staged
+        with self.lock:
+            self.conn.execute('UPDATE runs SET active = ? WHERE run = ?', (time.time(), self.run))
+            self.next_transfer += 1
+            self.pending[self.next_transfer] = []
+            return self.next_transfer
+
+    def stage(self, transfer, record):
+        with self.lock:
+            rows = self.pending[transfer]
+            rows.append((self.run, transfer) + tuple(record))
+            if len(rows) >= self.batch_size:
+                self._flush(transfer)
+
+    def _flush(self, transfer):
+        rows = self.pending.get(transfer)
+        if rows:
+            self.conn.executemany('INSERT OR REPLACE INTO staged VALUES (?, ?, ?, ?, ?, ?, ?)', rows)
+            rows.clear()
+
+    def diff(self, transfer, domain, server):
+        # Yields ('+', record) / ('-', record) between the stored snapshot and
+        # a staged transfer. The lock is held until the generator is exhausted
+        # or closed.
+        with self.lock:
+            self._flush(transfer)
+            yield from (('+', row) for row in self.conn.execute(
+                'SELECT name, rdclass, rdtype, data, ttl FROM staged s WHERE run = ? AND transfer = ? AND NOT EXISTS ('
+                'SELECT 1 FROM records r WHERE r.domain = ? AND r.server = ? AND r.name = s.name '
+                'AND r.rdclass = s.rdclass AND r.rdtype = s.rdtype AND r.data = s.data) '
+                'ORDER BY name, rdtype, data', (self.run, transfer, domain, server)
+            ))
+            yield from (('-', row) for row in self.conn.execute(
+                'SELECT name, rdclass, rdtype, data, ttl FROM records r WHERE domain = ? AND server = ? AND NOT EXISTS ('
+                'SELECT 1 FROM staged s WHERE s.run = ? AND s.transfer = ? AND s.name = r.name '
+                'AND s.rdclass = r.rdclass AND s.rdtype = r.rdtype AND s.data = r.data) '
+                'ORDER BY name, rdtype, data', (domain, server, self.run, transfer)
+            ))
+
+    def replace(self, transfer, domain, server, serial):
+        # Makes a staged full transfer the snapshot for (domain, server)
+        with self.lock:
+            self._flush(transfer)
+            with transaction(self.conn):
+                self.conn.execute('DELETE FROM records WHERE domain = ? AND server = ?', (domain, server))
+                self.conn.execute(
+                    'INSERT INTO records SELECT ?, ?, name, rdclass, rdtype, data, ttl FROM staged '
+                    'WHERE run = ? AND transfer = ?', (domain, server, self.run, transfer)
+                )
+                self.conn.execute('INSERT OR REPLACE INTO zones VALUES (?, ?, ?, ?)',
+                                  (domain, server, serial, time.time()))
+
+    def discard(self, transfer):
+        with self.lock:
+            self.pending.pop(transfer, None)
+            self.conn.execute('DELETE FROM staged WHERE run = ? AND transfer = ?', (self.run, transfer))
+
+    def apply(self, domain, server, serial, deleted, added):
+        # Applies the net changes of an IXFR: records in `deleted` are removed,
+        # records in `added` are inserted (or get their new TTL)
+        with self.lock, transaction(self.conn):
+            self.conn.executemany(
+                'DELETE FROM records WHERE domain = ? AND server = ? AND name = ? AND rdclass = ? AND rdtype = ? AND data = ?',
+                ((domain, server) + tuple(record[:4]) for record in deleted)
+            )
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO records VALUES (?, ?, ?, ?, ?, ?, ?)',
+                ((domain, server) + tuple(record) for record in added)
+            )
+            self.conn.execute('INSERT OR REPLACE INTO zones VALUES (?, ?, ?, ?)', (domain, server, serial, time.time()))
+
+    def records(self, domain, server):
+        # Records of the stored snapshot; the lock is held until the generator
+        # is exhausted or closed
+        with self.lock:
+            yield from self.conn.execute(
+                'SELECT name, rdclass, rdtype, data, ttl FROM records WHERE domain = ? AND server = ? '
+                'ORDER BY name, rdtype, data', (domain, server)
+            )
+
+    def zones(self):
+        with self.lock:
+            return self.conn.execute(
+                'SELECT z.domain, z.server, z.serial, z.updated, COUNT(r.name) FROM zones z '
+                'LEFT JOIN records r ON r.domain = z.domain AND r.server = z.server '
+                'GROUP BY z.domain, z.server ORDER BY z.domain, z.server'
+            ).fetchall()
+
+    def close(self):
+        with self.lock:
+            self.conn.execute('DELETE FROM staged WHERE run = ?', (self.run,))
+            self.conn.execute('DELETE FROM runs WHERE run = ?', (self.run,))
+            self.conn.close()
+
+def main():
+    parser = argparse.ArgumentParser(description='Zone snapshots stored by dns_zone_transfer.py --monitor')
+    parser.add_argument('path', nargs='?', default=DEFAULT_SNAPSHOT_PATH, help='Snapshot database file')
+    args = parser.parse_args()
+
+    if not os.path.exists(args.path):
+        print(f"[-] Snapshot store {args.path} does not exist")
+        return
+    snapshots = ZoneSnapshots(args.path)
+    for domain, server, serial, updated, count in snapshots.zones():
+        print(f"{domain} @ {server}: serial {serial}, {count} records, "
+              f"updated {datetime.fromtimestamp(updated).strftime('%Y-%m-%d %H:%M:%S')}")
+    snapshots.close()
+
+if __name__ == "__main__":
+    main()